@@ -0,0 +1,62 @@
+# Peak memory of parsing and rendering one large synthetic document.
+#
+#   python3 bench/bench_memory.py [--paragraphs N] [--src DIR]
+#
+# --src points at the generator sources to measure (defaults to this tree's
+# src/), which makes it easy to compare against an older checkout. The parse
+# runs in a fresh child process so the parent's imports don't count.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PARAGRAPH = (
+    "Some **bold words** and _italic words_ with `inline code`, a "
+    "[link to the blog](/blog/tom) and an ![image](/images/tom.png) "
+    "followed by plain text to pad the line out a little further."
+)
+
+def synthetic_document(paragraphs):
+    blocks = ["# Synthetic document"]
+    for i in range(paragraphs):
+        if i % 10 == 9:
+            blocks.append("\n".join(f"- item {j} with **bold** text" for j in range(5)))
+        elif i % 10 == 4:
+            blocks.append(f"## Section {i}")
+        else:
+            blocks.append(PARAGRAPH)
+    return "\n\n".join(blocks)
+
+CHILD = """
+import gc, json, resource, sys
+sys.path.insert(0, sys.argv[1])
+from blocknodes import markdown_to_html_node
+markdown = sys.stdin.read()
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+node = markdown_to_html_node(markdown)
+html = node.to_html()
+gc.collect()
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"baseline_rss_kb": baseline, "peak_rss_kb": peak, "html_bytes": len(html)}))
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak RSS of parsing and rendering a large synthetic document.")
+    parser.add_argument("--paragraphs", type=int, default=50000)
+    parser.add_argument("--src", default=os.path.join(ROOT, "src"))
+    args = parser.parse_args()
+    markdown = synthetic_document(args.paragraphs)
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, os.path.abspath(args.src)],
+        input=markdown, capture_output=True, text=True, check=True,
+    )
+    report = json.loads(result.stdout)
+    report["markdown_bytes"] = len(markdown.encode())
+    report["src"] = os.path.abspath(args.src)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Deterministic synthetic sites for the benchmarks: the same arguments always
+# produce byte-identical content, so results from different releases compare.
+import os
+import random
+
+WORDS = (
+    "the of and to in a is that for it as was with be by on not he i this are "
+    "or his from at which but have an they you were her she there one all we "
+    "ring hobbit shire elf dwarf wizard mountain river forest road king sword "
+    "tower shadow light journey song fellowship council gate stone fire"
+).split()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PATH = os.path.join(ROOT, "template.html")
+
+def inline_text(rng, words, density):
+    out = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < density:
+            kind = rng.randrange(6)
+            if kind == 0:
+                word = f"**{word} {rng.choice(WORDS)}**"
+            elif kind == 1:
+                word = f"_{word}_"
+            elif kind == 2:
+                word = f"`{word}()`"
+            elif kind == 3:
+                word = f"[{word}](/blog/{rng.choice(WORDS)})"
+            elif kind == 4:
+                word = f"![{word}](/images/{rng.choice(WORDS)}.png)"
+            else:
+                word = f"**{word} _{rng.choice(WORDS)}_**"
+        out.append(word)
+    return " ".join(out)
+
+def block(rng, density):
+    kind = rng.randrange(10)
+    if kind == 0:
+        return "#" * rng.randint(2, 4) + " " + inline_text(rng, rng.randint(2, 6), density)
+    if kind == 1:
+        return "\n".join("- " + inline_text(rng, rng.randint(3, 12), density) for _ in range(rng.randint(2, 6)))
+    if kind == 2:
+        return "\n".join(f"{i}. " + inline_text(rng, rng.randint(3, 12), density) for i in range(1, rng.randint(3, 7)))
+    if kind == 3:
+        return "\n".join("> " + inline_text(rng, rng.randint(5, 15), density) for _ in range(rng.randint(1, 3)))
+    if kind == 4:
+        return "```\n" + "\n".join(f"print({rng.choice(WORDS)!r})" for _ in range(rng.randint(2, 8))) + "\n```"
+    lines = [inline_text(rng, rng.randint(8, 20), density) for _ in range(rng.randint(1, 4))]
+    return "\n".join(lines)
+
+def page_markdown(rng, page_size, density, title):
+    blocks = [f"# {title}"]
+    size = len(blocks[0])
+    while size < page_size:
+        blocks.append(block(rng, density))
+        size += len(blocks[-1]) + 2
+    return "\n\n".join(blocks) + "\n"
+
+def generate_site(root, pages=200, page_size=8192, density=0.15, seed=0):
+    # writes root/content/**.md and root/template.html; returns the total
+    # number of markdown bytes written
+    rng = random.Random(seed)
+    content = os.path.join(root, "content")
+    total = 0
+    for i in range(pages):
+        section = f"section{i % 10}"
+        path = os.path.join(content, section, f"page{i}", "index.md") if i else os.path.join(content, "index.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        markdown = page_markdown(rng, page_size, density, f"Page {i}")
+        with open(path, "w") as f:
+            f.write(markdown)
+        total += len(markdown.encode())
+    with open(TEMPLATE_PATH, "r") as src, open(os.path.join(root, "template.html"), "w") as dst:
+        dst.write(src.read())
+    return total
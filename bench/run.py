@@ -0,0 +1,108 @@
+# Parser and build throughput on a synthetic site.
+#
+#   python3 bench/run.py [--pages N] [--page-size BYTES] [--density D] [--output FILE]
+#
+# Prints a JSON report with the best time of --repeat runs for each stage and
+# the matching pages/s and MB/s figures.
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate_site
+from blocknodes import markdown_to_html_node
+from conversion_functions import markdown_to_blocks, text_to_textnodes
+from copy_contents import collect_pages, generate_pages
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def stage(seconds, pages, size):
+    return {
+        "seconds": round(seconds, 6),
+        "pages_per_s": round(pages / seconds, 1) if seconds else None,
+        "mb_per_s": round(size / seconds / 1e6, 3) if seconds else None,
+    }
+
+def run(args):
+    with tempfile.TemporaryDirectory() as root:
+        total = generate_site(root, args.pages, args.page_size, args.density, args.seed)
+        content = os.path.join(root, "content")
+        dest = os.path.join(root, "docs")
+        template = os.path.join(root, "template.html")
+        pages = collect_pages(content, dest)
+        sources = []
+        for source, _ in pages:
+            with open(source, "r") as f:
+                sources.append(f.read())
+        texts = [block for markdown in sources for block in markdown_to_blocks(markdown) if not block.startswith("```")]
+        text_size = sum(len(text.encode()) for text in texts)
+        trees = [markdown_to_html_node(markdown) for markdown in sources]
+
+        def inline():
+            for text in texts:
+                text_to_textnodes(text)
+
+        def parse():
+            for markdown in sources:
+                markdown_to_html_node(markdown)
+
+        def render():
+            for tree in trees:
+                tree.to_html()
+
+        def build():
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages(pages, template, "/", jobs=args.jobs)
+
+        n = len(pages)
+        return {
+            "python": platform.python_version(),
+            "corpus": {
+                "pages": n,
+                "page_size": args.page_size,
+                "density": args.density,
+                "seed": args.seed,
+                "markdown_bytes": total,
+            },
+            "stages": {
+                "text_to_textnodes": stage(best_time(inline, args.repeat), n, text_size),
+                "markdown_to_html_node": stage(best_time(parse, args.repeat), n, total),
+                "to_html": stage(best_time(render, args.repeat), n, total),
+                "generate_pages": stage(best_time(build, args.repeat), n, total),
+            },
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the markdown pipeline on a synthetic site.")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=8192, help="approximate markdown bytes per page")
+    parser.add_argument("--density", type=float, default=0.15, help="fraction of words carrying inline markup")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=1, help="worker processes for the full build stage")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
+import re
+import time
 from enum import Enum
-from conversion_functions import markdown_to_blocks, text_node_to_html_node, text_to_textnodes
+import profiler
+from conversion_functions import text_node_to_html_node, text_to_textnodes
 from htmlnode import HTMLNode, ParentNode
 from textnode import TextNode, TextType
 
+HEADING_TAGS = frozenset(("h1", "h2", "h3", "h4", "h5", "h6"))
+
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
     HEADING = "heading"
@@ -11,86 +16,353 @@ class BlockType(Enum):
     UNORDERED_LIST = "unordered_list"
     ORDERED_LIST = "ordered_list"
 
+HEADING_PREFIXES = ("# ", "## ", "### ", "#### ", "##### ", "###### ")
+ORDERED_MARKER = re.compile(r"(\d+)\. ")
+WORD = re.compile(r"[^\W_]+")
+# positions kept per term and page; counts are always exact
+MAX_TERM_POSITIONS = 32
+
+
 def block_to_block_type(block):
-    if block.startswith(("# ", "## ", "### ", "#### ", "##### ", "###### ")):
-        return BlockType.HEADING
-    elif block.startswith("```") and block.endswith("```"):
-        return BlockType.CODE
-    elif block.startswith(">"):
-        is_block = True
-        for item in block.split("\n"):
-            if not item:
+    return scan_block(block).block_type
+
+
+def scan_block(block):
+    lines = block.split("\n")
+    scanned = Block(lines[0])
+    for line in lines[1:]:
+        scanned.add(line)
+    scanned.finish()
+    return scanned
+
+
+def list_marker(text):
+    # (ordered, number, item text) for "- item" and "12. item"
+    if text.startswith("- "):
+        return False, None, text[2:]
+    match = ORDERED_MARKER.match(text)
+    if match:
+        return True, int(match.group(1)), text[match.end() :]
+    return None
+
+
+class ListLevel:
+    # one (possibly nested) list: each item is a list of parts, a part being
+    # either a paragraph's text fragments or a nested ListLevel
+    __slots__ = ("indent", "ordered", "start", "items")
+
+    def __init__(self, indent, ordered, start, text):
+        self.indent = indent
+        self.ordered = ordered
+        self.start = start
+        self.items = [[[text]]]
+
+
+class Block:
+    # a block scanned one line at a time: the first line picks its type, each
+    # following line either confirms it or turns it into a paragraph, and the
+    # content the node needs is collected in the same pass
+    __slots__ = ("block_type", "lines", "held", "quote_texts", "fence_open", "levels", "next_number", "gap", "committed")
+
+    def __init__(self, first_line, fences=True):
+        first_line = first_line.lstrip()
+        self.lines = [first_line]
+        # whitespace-only lines, kept until we know they aren't trailing
+        self.held = []
+        self.fence_open = False
+        # a list followed by blank lines, waiting to see whether indented
+        # continuation lines follow; once one does, the list can no longer
+        # turn into a paragraph
+        self.gap = False
+        self.committed = False
+        if first_line.startswith(HEADING_PREFIXES):
+            self.block_type = BlockType.HEADING
+        elif first_line.startswith("```"):
+            self.block_type = BlockType.CODE
+            closed = len(first_line.rstrip()) > 3 and first_line.rstrip().endswith("```")
+            self.fence_open = fences and not closed
+        elif first_line.startswith(">"):
+            self.block_type = BlockType.QUOTE
+            self.quote_texts = [first_line.lstrip(">").strip()]
+        else:
+            marker = list_marker(first_line)
+            if marker and (not marker[0] or marker[1] == 1):
+                ordered, number, text = marker
+                self.block_type = BlockType.ORDERED_LIST if ordered else BlockType.UNORDERED_LIST
+                self.levels = [ListLevel(0, ordered, 1, text)]
+                self.next_number = 2
+            else:
+                self.block_type = BlockType.PARAGRAPH
+
+    def is_list(self):
+        return self.block_type in (BlockType.UNORDERED_LIST, BlockType.ORDERED_LIST)
+
+    def add(self, line):
+        # False when the line starts a new block instead
+        if self.fence_open:
+            self.lines.append(line)
+            if line.rstrip().endswith("```"):
+                self.fence_open = False
+            return True
+        if not line.strip():
+            self.held.append(line)
+            return True
+        if self.held:
+            for held in self.held:
+                self.accept(held)
+            self.held = []
+        return self.accept(line)
+
+    def accept(self, line):
+        self.lines.append(line)
+        if self.block_type == BlockType.QUOTE:
+            if line.startswith(">"):
+                self.quote_texts.append(line.lstrip(">").strip())
+            else:
+                self.block_type = BlockType.PARAGRAPH
+        elif self.is_list():
+            return self.list_line(line, False)
+        return True
+
+    def add_after_gap(self, line):
+        # an indented line after blank lines continues the last list item
+        self.gap = False
+        self.committed = True
+        self.held = []
+        self.list_line(line, True)
+
+    def list_line(self, line, new_paragraph):
+        text = line.lstrip(" \t")
+        indent = len(line.expandtabs(4)) - len(text)
+        levels = self.levels
+        marker = list_marker(text)
+        if indent == 0 and (marker or not self.committed):
+            ordered = self.block_type == BlockType.ORDERED_LIST
+            if not marker or marker[0] != ordered or (ordered and marker[1] != self.next_number):
+                if self.committed:
+                    # a different list right after this one
+                    self.lines.pop()
+                    return False
+                self.block_type = BlockType.PARAGRAPH
+                return True
+            self.next_number += 1
+            del levels[1:]
+            levels[0].items.append([[marker[2]]])
+        elif marker and indent:
+            ordered, number, item_text = marker
+            while len(levels) > 1 and levels[-1].indent > indent:
+                levels.pop()
+            if levels[-1].indent == indent:
+                levels[-1].items.append([[item_text]])
+            else:
+                nested = ListLevel(indent, ordered, number or 1, item_text)
+                levels[-1].items[-1].append(nested)
+                levels.append(nested)
+        elif new_paragraph:
+            while len(levels) > 1 and levels[-1].indent >= indent:
+                levels.pop()
+            levels[-1].items[-1].append([text])
+        else:
+            # lazy continuation of the deepest open item
+            parts = levels[-1].items[-1]
+            if isinstance(parts[-1], ListLevel):
+                parts.append([text])
+            else:
+                parts[-1].append(text)
+        return True
+
+    def finish(self):
+        self.held = []
+        self.lines[-1] = self.lines[-1].rstrip()
+        if self.block_type == BlockType.CODE and (self.fence_open or not self.lines[-1].endswith("```")):
+            self.block_type = BlockType.PARAGRAPH
+
+    def to_html_node(self):
+        self.finish()
+        if self.block_type == BlockType.PARAGRAPH:
+            return ParentNode("p", text_to_children(" ".join(self.lines)))
+        if self.block_type == BlockType.HEADING:
+            return heading_to_html_node("\n".join(self.lines))
+        if self.block_type == BlockType.CODE:
+            return code_to_html_node("\n".join(self.lines))
+        if self.block_type == BlockType.QUOTE:
+            return ParentNode("blockquote", text_to_children(" ".join(self.quote_texts)))
+        last = self.levels[-1].items[-1][-1]
+        if not isinstance(last, ListLevel):
+            last[-1] = last[-1].rstrip()
+        return list_to_html_node(self.levels[0])
+
+
+def scan_blocks(lines, fences=True):
+    # one pass over the document's lines, yielding a node per block. Blocks
+    # end at empty lines, except inside a fenced code block or where an
+    # indented line after the blank continues a list item.
+    block = None
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if line.endswith("\n"):
+            line = line[:-1]
+        if block is None:
+            if line.strip():
+                block = Block(line, fences)
+            continue
+        if block.fence_open:
+            block.add(line)
+            continue
+        if line == "":
+            if block.is_list():
+                block.gap = True
                 continue
-            if not item.startswith(">"):
-                is_block = False
-                break
-        if is_block:
-            return BlockType.QUOTE
-    elif block.startswith("- "):
-        is_block = True
-        for item in block.split("\n"):
-            if not item:
+            yield block.to_html_node()
+            block = None
+            continue
+        if block.gap:
+            if not line.strip():
                 continue
-            if not item.startswith("- "):
-                is_block = False
-                break
-        if is_block:
-            return BlockType.UNORDERED_LIST
-    elif block.startswith("1. "):
-        lines = block.split("\n")
-        is_block = True
-        for i, item in enumerate(lines, 1):
-            if not item:
+            if line[0] in (" ", "\t"):
+                block.add_after_gap(line)
                 continue
-            if not item.startswith(f"{i}. "):
-                is_block = False
-                break
-        if is_block:
-            return BlockType.ORDERED_LIST
-    return BlockType.PARAGRAPH
+        elif block.add(line):
+            continue
+        yield block.to_html_node()
+        block = Block(line, fences)
+    if block is None:
+        return
+    if block.fence_open:
+        # never closed: read those lines again as ordinary blocks
+        yield from scan_blocks(block.lines, False)
+    else:
+        yield block.to_html_node()
+
+
+def list_to_html_node(level):
+    html_items = []
+    for parts in level.items:
+        paragraphs = sum(1 for part in parts if not isinstance(part, ListLevel))
+        children = []
+        for part in parts:
+            if isinstance(part, ListLevel):
+                children.append(list_to_html_node(part))
+            elif paragraphs == 1:
+                children.extend(text_to_children(" ".join(part)))
+            else:
+                children.append(ParentNode("p", text_to_children(" ".join(part))))
+        html_items.append(ParentNode("li", children))
+    if not level.ordered:
+        return ParentNode("ul", html_items)
+    props = {"start": str(level.start)} if level.start != 1 else None
+    return ParentNode("ol", html_items, props)
+
+class Document:
+    # everything generate_page needs from one markdown file, from one parse.
+    # terms maps each word of the page text to [count, first positions], for
+    # the search index, and links lists every href and src in the page, for
+    # the link checker; each is None when it wasn't collected.
+    __slots__ = ("html_node", "title", "headings", "body", "terms", "words", "links")
+
+    def __init__(self, html_node, title=None, headings=None, terms=None, links=None):
+        self.html_node = html_node
+        self.title = title
+        self.headings = headings or []
+        self.terms = terms
+        self.links = links
+        self.words = 0
+        # the rendered html_node, when it was rendered up front or loaded
+        # from the parse cache instead of parsed
+        self.body = None
+
+    def iter_body(self):
+        if self.body is not None:
+            return iter((self.body,))
+        return self.html_node.iter_html()
+
+    def __repr__(self):
+        return f"Document({self.title}, {self.headings}, {self.html_node})"
+
+
+def parse_document(markdown, collect_terms=False, collect_links=False):
+    # markdown is either the whole text or an iterable of lines (an open file)
+    if isinstance(markdown, str):
+        markdown = markdown.split("\n")
+    document = Document(None, terms={} if collect_terms else None, links=[] if collect_links else None)
+    children = list(iter_document_nodes(markdown, document))
+    document.html_node = ParentNode("div", children, None)
+    return document
+
+
+def iter_document_nodes(lines, document):
+    # converts blocks lazily, filling in the document's title, headings,
+    # terms and links as they go past
+    for html_node in scan_blocks(lines):
+        if html_node.tag in HEADING_TAGS:
+            text = node_text(html_node).strip()
+            document.headings.append((int(html_node.tag[1]), text))
+            if document.title is None and html_node.tag == "h1" and html_node.children:
+                document.title = node_text(html_node.children[0]).strip()
+        if document.terms is not None:
+            add_terms(document, node_text(html_node))
+        if document.links is not None:
+            add_links(document.links, html_node)
+        yield html_node
+
+
+def add_terms(document, text):
+    terms = document.terms
+    position = document.words
+    for word in WORD.findall(text.lower()):
+        entry = terms.get(word)
+        if entry is None:
+            terms[word] = [1, [position]]
+        else:
+            entry[0] += 1
+            if len(entry[1]) < MAX_TERM_POSITIONS:
+                entry[1].append(position)
+        position += 1
+    document.words = position
+
+
+def add_links(links, node):
+    # only the leaves made for links and images carry props
+    if node.props:
+        url = node.props.get("href")
+        if url is None:
+            url = node.props.get("src")
+        if url is not None:
+            links.append(url)
+    if node.children:
+        for child in node.children:
+            add_links(links, child)
+
+
+def node_text(node):
+    if node.children is None:
+        return node.value or ""
+    return "".join(node_text(child) for child in node.children)
+
 
 def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    children = []
-    for block in blocks:
-        html_node = block_to_html_node(block)
-        children.append(html_node)
-    return ParentNode("div", children, None)
+    return parse_document(markdown).html_node
 
 
 def block_to_html_node(block):
-    block_type = block_to_block_type(block)
-    if block_type == BlockType.PARAGRAPH:
-        return paragraph_to_html_node(block)
-    if block_type == BlockType.HEADING:
-        return heading_to_html_node(block)
-    if block_type == BlockType.CODE:
-        return code_to_html_node(block)
-    if block_type == BlockType.ORDERED_LIST:
-        return olist_to_html_node(block)
-    if block_type == BlockType.UNORDERED_LIST:
-        return ulist_to_html_node(block)
-    if block_type == BlockType.QUOTE:
-        return quote_to_html_node(block)
-    raise ValueError("invalid block type")
+    return scan_block(block).to_html_node()
 
 
 def text_to_children(text):
+    page = profiler.current
+    if page is not None:
+        started = time.perf_counter()
     text_nodes = text_to_textnodes(text)
     children = []
     for text_node in text_nodes:
         html_node = text_node_to_html_node(text_node)
         children.append(html_node)
+    if page is not None:
+        page.add("inline", started, time.perf_counter() - started)
     return children
 
 
-def paragraph_to_html_node(block):
-    lines = block.split("\n")
-    paragraph = " ".join(lines)
-    children = text_to_children(paragraph)
-    return ParentNode("p", children)
-
-
 def heading_to_html_node(block):
     level = 0
     for char in block:
@@ -115,45 +387,13 @@ def code_to_html_node(block):
     return ParentNode("pre", [code])
 
 
-def olist_to_html_node(block):
-    items = block.split("\n")
-    html_items = []
-    for item in items:
-        text = item[3:]
-        children = text_to_children(text)
-        html_items.append(ParentNode("li", children))
-    return ParentNode("ol", html_items)
-
-
-def ulist_to_html_node(block):
-    items = block.split("\n")
-    html_items = []
-    for item in items:
-        text = item[2:]
-        children = text_to_children(text)
-        html_items.append(ParentNode("li", children))
-    return ParentNode("ul", html_items)
-
-
-def quote_to_html_node(block):
-    lines = block.split("\n")
-    new_lines = []
-    for line in lines:
-        if not line.startswith(">"):
-            raise ValueError("invalid quote block")
-        new_lines.append(line.lstrip(">").strip())
-    content = " ".join(new_lines)
-    children = text_to_children(content)
-    return ParentNode("blockquote", children)
+def extract_title(markdown):
+    return require_title(parse_document(markdown))
 
 
-def extract_title(markdown):
-    blocks = markdown_to_blocks(markdown)
-    for block in blocks:
-        htmlnode = block_to_html_node(block)
-        if htmlnode.tag == "h1":
-            for child in htmlnode.children:
-                return child.value.strip()
-    raise Exception("No level 1 heading found in the markdown.")
+def require_title(document):
+    if document.title is None:
+        raise Exception("No level 1 heading found in the markdown.")
+    return document.title
 
 
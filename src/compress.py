@@ -0,0 +1,139 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from manifest import CACHE_DIR, hash_bytes
+
+COMPRESS_STATE_PATH = os.path.join(CACHE_DIR, "compressed")
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".txt", ".xml")
+SIBLING_SUFFIXES = (".gz", ".zst", ".br")
+
+
+def gzip_bytes(data):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def available_encodings():
+    # (name, sibling suffix, compress function); zstd and brotli only when
+    # their packages are installed
+    encodings = [("gzip", ".gz", gzip_bytes)]
+    try:
+        import zstandard
+    except ImportError:
+        pass
+    else:
+        encodings.append(("zstd", ".zst", zstandard.ZstdCompressor(level=19).compress))
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        encodings.append(("br", ".br", lambda data: brotli.compress(data, quality=11)))
+    return encodings
+
+
+def is_compressible(path):
+    return path.endswith(COMPRESSIBLE)
+
+
+class Compressor:
+    # writes precompressed siblings (index.html.gz, ...) on a thread pool, so
+    # pages can be handed over as soon as they are generated. A file is only
+    # recompressed when its contents differ from what the siblings were made
+    # from.
+    def __init__(self, encodings=None, jobs=None, state_path=COMPRESS_STATE_PATH):
+        self.encodings = encodings or available_encodings()
+        self.names = [name for name, suffix, compress in self.encodings]
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.state_path = state_path
+        self.state = load_state(state_path)
+        self.futures = {}
+
+    def submit(self, path):
+        if path in self.futures or not is_compressible(path):
+            return
+        self.futures[path] = self.executor.submit(self.compress, path, self.state.get(path))
+
+    def sweep(self, root):
+        # everything not handed over while it was generated: static files and
+        # pages that were already up to date
+        for dir_path, dirs, files in os.walk(root):
+            dirs.sort()
+            for name in sorted(files):
+                self.submit(os.path.join(dir_path, name))
+
+    def compress(self, path, entry):
+        st = os.stat(path)
+        if self.is_current(path, entry) and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry, False
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hash_bytes(data)
+        if self.is_current(path, entry) and entry["hash"] == digest:
+            # rewritten with the same contents: keep the siblings, touched so
+            # they stay newer than the file (the server ignores older ones)
+            for suffix in entry["written"]:
+                os.utime(path + suffix)
+            return dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns), False
+        written = []
+        for name, suffix, compress in self.encodings:
+            sibling = path + suffix
+            compressed = compress(data)
+            # a sibling that isn't smaller than the file is never worth serving
+            if len(compressed) >= len(data):
+                if os.path.exists(sibling):
+                    os.remove(sibling)
+                continue
+            tmp_path = sibling + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, sibling)
+            written.append(suffix)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest, "encodings": self.names, "written": written}
+        return entry, True
+
+    def is_current(self, path, entry):
+        if not entry or entry["encodings"] != self.names:
+            return False
+        return all(os.path.exists(path + suffix) for suffix in entry["written"])
+
+    def finish(self):
+        # waits for every submitted file, drops the siblings of files that no
+        # longer exist and saves the state; returns how many were compressed
+        compressed = 0
+        for path, future in self.futures.items():
+            try:
+                entry, changed = future.result()
+            except OSError as e:
+                print(f"Error compressing {path}: {str(e)}")
+                self.state.pop(path, None)
+                continue
+            self.state[path] = entry
+            compressed += changed
+        for path in [path for path in self.state if not os.path.exists(path)]:
+            for suffix in self.state.pop(path)["written"]:
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        self.futures = {}
+        save_state(self.state_path, self.state)
+        return compressed
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def load_state(state_path):
+    try:
+        with open(state_path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(state_path, state):
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, sort_keys=True)
+    os.replace(tmp_path, state_path)
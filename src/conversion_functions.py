@@ -1,8 +1,16 @@
 from textnode import TextNode, TextType
-from htmlnode import HTMLNode, LeafNode
+from htmlnode import HTMLNode, LeafNode, ParentNode
 import re
 
 def text_node_to_html_node(text_node):
+    if text_node.children:
+        children = [text_node_to_html_node(child) for child in text_node.children]
+        if text_node.text_type.value == "bold":
+            return ParentNode("b", children)
+        elif text_node.text_type.value == "italic":
+            return ParentNode("i", children)
+        else:
+            raise Exception("Only bold and italic text nodes can be nested")
     if text_node.text_type.value == "text":
         return LeafNode(tag=None,value = text_node.text)
     elif text_node.text_type.value == "bold":
@@ -78,19 +86,70 @@ def split_nodes_link(old_nodes):
                 return_list.append(TextNode(extract_markdown_links(item)[0][0], TextType.LINK, extract_markdown_links(item)[0][1]))
     return return_list
 
+INLINE_TOKEN = re.compile(r"!\[|\[|\*\*|_|`")
+INLINE_LINK = re.compile(r"\[([^\[\]]*)\]\(([^\(\)]*)\)")
+INLINE_DELIMITERS = {"**": TextType.BOLD, "_": TextType.ITALIC, "`": TextType.CODE}
+
 def text_to_textnodes(text):
-    # start with whole text, process, images, links, bold, italic, code
-    return_nodes = []
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    for node in nodes:
-        if not node.text.isspace():
-            return_nodes.append(node)
-    return return_nodes
+    # single left-to-right scan: images, links, bold, italic and code are
+    # recognised where they start instead of in one pass per syntax
+    if not text:
+        return [TextNode(text, TextType.TEXT)]
+    return scan_inline(text, 0, len(text))
+
+def scan_inline(text, pos, end):
+    nodes = []
+    text_start = pos
+    unclosed = set()
+    while pos < end:
+        match = INLINE_TOKEN.search(text, pos, end)
+        if not match:
+            break
+        start = match.start()
+        token = match.group()
+        if token in ("![", "["):
+            link = INLINE_LINK.match(text, match.end() - 1, end)
+            if not link:
+                pos = match.end()
+                continue
+            append_text(nodes, text, text_start, start)
+            text_type = TextType.IMAGE if token == "![" else TextType.LINK
+            nodes.append(TextNode(link.group(1), text_type, link.group(2)))
+            pos = text_start = link.end()
+            continue
+        close = -1
+        if token not in unclosed:
+            close = text.find(token, match.end(), end)
+        if close == -1:
+            # no closing delimiter anywhere after this one: it is plain text,
+            # and so is every later occurrence, even when another span
+            # (such as **bold**) follows
+            unclosed.add(token)
+            pos = match.end()
+            continue
+        append_text(nodes, text, text_start, start)
+        inner_start = match.end()
+        text_type = INLINE_DELIMITERS[token]
+        if close > inner_start:
+            inner = text[inner_start:close]
+            if text_type == TextType.CODE:
+                children = None
+            else:
+                children = scan_inline(text, inner_start, close)
+            if not inner.isspace():
+                if children and (len(children) > 1 or children[0].text_type != TextType.TEXT):
+                    nodes.append(TextNode("".join(child.text for child in children), text_type, children=children))
+                else:
+                    nodes.append(TextNode(inner, text_type))
+        pos = text_start = close + len(token)
+    append_text(nodes, text, text_start, end)
+    return nodes
+
+def append_text(nodes, text, start, end):
+    if start < end:
+        chunk = text[start:end]
+        if not chunk.isspace():
+            nodes.append(TextNode(chunk, TextType.TEXT))
 
 def markdown_to_blocks(markdown):
     parsed_md = []
@@ -1,67 +1,431 @@
+import io
+import json
 import os
 import shutil
-from blocknodes import markdown_to_html_node, extract_title
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from blocknodes import Document, iter_document_nodes, parse_document, require_title
+from compress import SIBLING_SUFFIXES
+from css import rewrite_css_assets
+from manifest import CACHE_DIR, FINGERPRINT_EXTENSIONS, build_inputs, hash_bytes, hash_file, reference_inputs
+from template import Template, template_references
 
-def copy_files():
-    source_path = os.path.normpath(os.path.join("src", "../static"))
-    dest_path = os.path.normpath(os.path.join("src", "../docs"))
-    if os.path.exists(dest_path):
-        shutil.rmtree(dest_path)
-    os.mkdir(dest_path)  
-    def copy_item_recursive(src, dst):
-        if os.path.isfile(src):
-            shutil.copy(src, dst)
-        elif os.path.isdir(src):
-            if not os.path.exists(dst):
-                os.mkdir(dst)
-            for item in os.listdir(src):
-                src_item = os.path.join(src, item)
-                dst_item = os.path.join(dst, item)
-                copy_item_recursive(src_item, dst_item)
-    if os.path.exists(source_path):
-        copy_item_recursive(source_path, dest_path)
-
-def generate_page(from_path, template_path, dest_path, basepath):
+STATIC_STATE_PATH = os.path.join(CACHE_DIR, "static")
+LINK_MODES = ("copy", "hardlink", "reflink")
+STREAM_THRESHOLD = 32 * 1024 * 1024
+STREAM_SPOOL_SIZE = 1024 * 1024
+FICLONE = 0x40049409
+FINGERPRINT_LENGTH = 8
+
+def copy_files(source_path=None, dest_path=None, link="copy", state_path=STATIC_STATE_PATH, assets=None):
+    # sync static/ into docs/: only new or changed files are written and files
+    # that a previous sync put there but that left static/ are removed. Anything
+    # else in docs/ (the generated pages) is left alone.
+    # With an assets dict, stylesheets, scripts, images and fonts are written
+    # under a content-hashed name and assets maps their site URL to the hashed
+    # one, e.g. /index.css -> /index.3f9a1c2e.css; a changed file gets a new
+    # name and the old one is removed as an orphan. Everything else (CNAME,
+    # .nojekyll, robots.txt, favicon.ico, ...) keeps its name.
+    if link not in LINK_MODES:
+        raise ValueError(f"invalid link mode: {link}")
+    if source_path is None:
+        source_path = os.path.normpath(os.path.join("src", "../static"))
+    if dest_path is None:
+        dest_path = os.path.normpath(os.path.join("src", "../docs"))
+    os.makedirs(dest_path, exist_ok=True)
+    previous, known_hashes = load_static_state(state_path)
+    synced = []
+    # a sync without fingerprinting keeps the hashes for the next one
+    hashes = {} if assets is not None else known_hashes
+    copied = 0
+    rel_paths = []
+    for root, dirs, files in os.walk(source_path):
+        dirs.sort()
+        rel_root = os.path.relpath(root, source_path)
+        rel_paths.extend(os.path.normpath(os.path.join(rel_root, name)) for name in sorted(files))
+    if assets is not None:
+        # stylesheets last, so their url()s can point at the hashed names
+        rel_paths.sort(key=lambda rel_path: rel_path.endswith(".css"))
+    for rel_path in rel_paths:
+        src = os.path.join(source_path, rel_path)
+        data = None
+        if assets is not None and is_fingerprinted(rel_path):
+            if rel_path.endswith(".css"):
+                data = fingerprinted_css(src, asset_url(rel_path), assets)
+            file_hash = cached_hash(src, rel_path, known_hashes, hashes) if data is None else hash_bytes(data)
+            hashed_path = fingerprinted_name(rel_path, file_hash)
+            assets[asset_url(rel_path)] = asset_url(hashed_path)
+            rel_path = hashed_path
+        dst = os.path.join(dest_path, rel_path)
+        synced.append(rel_path)
+        if data is not None:
+            # the name already says whether the contents are current
+            if os.path.exists(dst):
+                continue
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            tmp_path = dst + ".sync-tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, dst)
+        else:
+            if not file_changed(src, dst):
+                continue
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            sync_file(src, dst, link)
+        copied += 1
+    removed = remove_orphans(dest_path, set(previous) - set(synced))
+    save_static_state(state_path, synced, hashes)
+    return copied, removed
+
+def is_fingerprinted(rel_path):
+    return os.path.splitext(rel_path)[1].lower() in FINGERPRINT_EXTENSIONS
+
+def fingerprinted_css(src, css_href, assets):
+    # the stylesheet with its url()s pointed at hashed names, or None when it
+    # references none and can be synced as is
+    with open(src, "rb") as f:
+        raw = f.read()
+    css = raw.decode("utf-8", "surrogateescape")
+    rewritten = rewrite_css_assets(css, css_href, assets)
+    if rewritten == css:
+        return None
+    return rewritten.encode("utf-8", "surrogateescape")
+
+def cached_hash(path, rel_path, known_hashes, hashes):
+    # size and mtime let an untouched file skip rehashing, as in ImageIndex
+    st = os.stat(path)
+    entry = known_hashes.get(rel_path)
+    if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+        entry = [st.st_size, st.st_mtime_ns, hash_file(path)]
+    hashes[rel_path] = entry
+    return entry[2]
+
+def fingerprinted_name(rel_path, file_hash):
+    stem, ext = os.path.splitext(rel_path)
+    return f"{stem}.{file_hash[:FINGERPRINT_LENGTH]}{ext}"
+
+def asset_url(rel_path):
+    return "/" + rel_path.replace(os.sep, "/")
+
+def file_changed(src, dst):
+    try:
+        dst_stat = os.stat(dst)
+    except FileNotFoundError:
+        return True
+    src_stat = os.stat(src)
+    if src_stat.st_size != dst_stat.st_size:
+        return True
+    if src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+        return False
+    # same size, different mtime (e.g. after a fresh checkout): compare contents
+    # and only refresh the timestamp when they match
+    if hash_file(src) != hash_file(dst):
+        return True
+    shutil.copystat(src, dst)
+    return False
+
+def sync_file(src, dst, link="copy"):
+    # write next to the destination and swap it in, so a hardlinked destination
+    # is never written through to its source
+    tmp_path = dst + ".sync-tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if link == "hardlink":
+        try:
+            os.link(src, tmp_path)
+            os.replace(tmp_path, dst)
+            return
+        except OSError:
+            pass
+    elif link == "reflink" and reflink_file(src, tmp_path):
+        shutil.copystat(src, tmp_path)
+        os.replace(tmp_path, dst)
+        return
+    shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+def reflink_file(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+def remove_orphans(dest_path, rel_paths):
+    removed = 0
+    for rel_path in sorted(rel_paths):
+        path = os.path.join(dest_path, rel_path)
+        if os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+        parent = os.path.dirname(path)
+        while parent and os.path.abspath(parent) != os.path.abspath(dest_path):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+    return removed
+
+def remove_outputs(dest_path, paths):
+    # generated files whose source is gone, with any precompressed siblings
+    rel_paths = []
+    for path in paths:
+        rel_path = os.path.relpath(path, dest_path)
+        rel_paths.append(rel_path)
+        rel_paths.extend(rel_path + suffix for suffix in SIBLING_SUFFIXES)
+    return remove_orphans(dest_path, rel_paths)
+
+def load_static_state(state_path):
+    # the paths the last sync wrote to docs/ and, for fingerprinted files,
+    # [size, mtime_ns, hash] of their source
+    try:
+        with open(state_path, "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return [], {}
+    if isinstance(data, list):
+        return data, {}
+    return data["synced"], data["hashes"]
+
+def save_static_state(state_path, rel_paths, hashes):
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    with open(state_path, "w") as f:
+        f.write(json.dumps({"synced": rel_paths, "hashes": hashes}))
+
+def generate_page(from_path, template_path, dest_path, basepath, profile=None, cache=None, collect_terms=False, collect_links=False):
+    # template_path may also be an already compiled Template
+    if profile is not None:
+        return generate_page_profiled(from_path, template_path, dest_path, basepath, profile, collect_terms, collect_links)
     print(f"Generating page from {from_path} to {dest_path}")
-    with open(from_path, "r") as f1: md_contents =  f1.read()
-    with open(template_path, "r") as f2:
-        template_contents = f2.read() 
-    html_node = markdown_to_html_node(md_contents)
-    html_string = html_node.to_html()
-    title = extract_title(md_contents)
-    template_contents = template_contents.replace("{{ Title }}", title)
-    template_contents = template_contents.replace("{{ Content }}", html_string)
-    template_contents = template_contents.replace('href="/', f'href="{basepath}')
-    template_contents = template_contents.replace('src="/', f'src="{basepath}')
+    if isinstance(template_path, Template):
+        template = template_path
+    else:
+        template = Template.load(template_path, basepath)
+    if os.path.getsize(from_path) > STREAM_THRESHOLD:
+        return stream_page(from_path, template, dest_path, collect_terms, collect_links)
+    if cache is None:
+        with open(from_path, "r") as f1: md_contents =  f1.read()
+        document = parse_document(md_contents, collect_terms, collect_links)
+    else:
+        # keyed by the same file hash the manifest records
+        with open(from_path, "rb") as f1: raw = f1.read()
+        source_hash = hash_bytes(raw)
+        document = cache.load(source_hash)
+        if document is None or (collect_terms and document.terms is None) or (collect_links and document.links is None):
+            md_contents = io.TextIOWrapper(io.BytesIO(raw)).read()
+            document = parse_document(md_contents, collect_terms, collect_links)
+            document.body = document.html_node.to_html()
+            cache.store(source_hash, document)
+    write_page(document, template, dest_path)
+    return document
+
+def stream_page(from_path, template, dest_path, collect_terms=False, collect_links=False):
+    # for very large sources: blocks are read, converted and written one at a
+    # time. The blocks before the first h1 are rendered into a spool (on disk
+    # past STREAM_SPOOL_SIZE) because the title is needed before the content
+    # in the template, so even a page without a title never holds its tree.
+    # Each chunk is rewritten as the node yields it, before it is spooled: the
+    # spool is read back in slices that can split a tag.
+    document = Document(None, terms={} if collect_terms else None, links=[] if collect_links else None)
+    with open(from_path, "r") as source, tempfile.SpooledTemporaryFile(STREAM_SPOOL_SIZE, "w+") as spool:
+        nodes = iter_document_nodes(source, document)
+        for node in nodes:
+            spool.writelines(template.rewrite(chunk) for chunk in node.iter_html())
+            if document.title is not None:
+                break
+        title = require_title(document)
+
+        def body():
+            yield "<div>"
+            spool.seek(0)
+            yield from iter(lambda: spool.read(1 << 16), "")
+            for node in nodes:
+                for chunk in node.iter_html():
+                    yield template.rewrite(chunk)
+            yield "</div>"
+
+        write_chunks(template.iter_render(title, body(), rewritten=True), dest_path)
+    return document
+
+def generate_page_profiled(from_path, template_path, dest_path, basepath, profile, collect_terms=False, collect_links=False):
+    # same output as generate_page, but each stage runs to completion on its
+    # own so it can be timed; inline parsing is reported by text_to_children
+    # and subtracted from the block stage
+    print(f"Generating page from {from_path} to {dest_path}")
+    with profile.stage("read"):
+        with open(from_path, "r") as f1: md_contents =  f1.read()
+    if isinstance(template_path, Template):
+        template = template_path
+    else:
+        template = Template.load(template_path, basepath)
+    inline_before = profile.stages["inline"]
+    with profile.stage("blocks"):
+        document = parse_document(md_contents, collect_terms, collect_links)
+    profile.stages["blocks"] -= profile.stages["inline"] - inline_before
+    title = require_title(document)
+    with profile.stage("to_html"):
+        html_string = document.html_node.to_html()
+    with profile.stage("template"):
+        page = template.render(title, html_string)
+    with profile.stage("write"):
+        write_chunks((page,), dest_path)
+    return document
+
+def write_page(document, template, dest_path):
+    title = require_title(document)
+    return write_chunks(template.iter_render(title, document.iter_body()), dest_path)
+
+def write_chunks(chunks, dest_path):
+    # returns whether dest_path changed
     if os.path.exists(dest_path):
         pass
     else:
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    with open(dest_path, "w") as destination:
-        destination.write(template_contents)
+    # stream into a temporary file so a page that fails halfway through
+    # rendering never replaces the previous output
+    tmp_path = dest_path + ".tmp"
+    try:
+        with open(tmp_path, "w") as destination:
+            destination.writelines(chunks)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return replace_if_changed(tmp_path, dest_path)
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
+def replace_if_changed(tmp_path, dest_path):
+    # identical output leaves the existing file and its mtime alone, so
+    # rsync and the deploy delta only see files whose contents changed
+    if same_contents(tmp_path, dest_path):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, dest_path)
+    return True
+
+def same_contents(path, other_path):
+    try:
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+        with open(path, "rb") as f1, open(other_path, "rb") as f2:
+            while True:
+                block = f1.read(1 << 16)
+                if block != f2.read(1 << 16):
+                    return False
+                if not block:
+                    return True
+    except FileNotFoundError:
+        return False
+
+def collect_pages(dir_path_content, dest_dir_path):
+    # (source, destination) for every markdown file, in the order the serial
+    # build has always visited them
+    pages = []
     try:
         all_contents = os.listdir(dir_path_content)
     except FileNotFoundError:
         print(f"Error: Directory {dir_path_content} not found")
-        return    
+        return pages
     for content in all_contents:
         current_path = os.path.join(dir_path_content, content)
         if os.path.isdir(current_path):
             rel_path = os.path.relpath(current_path, dir_path_content)
             new_dest_dir = os.path.join(dest_dir_path, rel_path)
             os.makedirs(new_dest_dir, exist_ok=True)
-            generate_pages_recursive(current_path, template_path, new_dest_dir, basepath)
-        
+            pages.extend(collect_pages(current_path, new_dest_dir))
         elif content.endswith(".md"):
+            output_filename = os.path.splitext(content)[0] + ".html"
+            pages.append((current_path, os.path.join(dest_dir_path, output_filename)))
+    return pages
+
+def generate_page_job(job, profile=None):
+    # runs in a worker process; errors come back as text so one bad page
+    # doesn't take down the pool. The document comes back without its node
+    # tree and body, which the caller doesn't need.
+    from_path, template_path, dest_path, basepath, cache, collect_terms, collect_links = job
+    try:
+        document = generate_page(from_path, template_path, dest_path, basepath, profile, cache, collect_terms, collect_links)
+    except Exception as e:
+        return str(e), None
+    document.html_node = None
+    document.body = None
+    return None, document
+
+def generate_pages(pages, template_path, basepath, manifest=None, inputs=None, jobs=1, profiler=None, cache=None, explain=False, assets=None, compressor=None, images=None, minify=False, styles=None, search=None, sitemap=None, links=None):
+    # profiling needs every page in this process, so it always runs serially
+    if manifest is not None and inputs is None:
+        inputs = build_inputs(template_path, basepath, assets, images, minify, styles, template_references(template_path))
+    # pages record the static files they reference, which needs their links
+    collect_links = links is not None or (manifest is not None and (assets is not None or images is not None))
+    stale = []
+    template = None
+    for from_path, dest_path in pages:
+        if manifest is not None:
             try:
-                output_filename = os.path.splitext(content)[0] + ".html"
-                output_path = os.path.join(dest_dir_path, output_filename)
-                generate_page(current_path, template_path, output_path, basepath)
-                print(f"Generated: {output_path}")
+                reasons = manifest.stale_reasons(from_path, dest_path, inputs, assets, images)
             except Exception as e:
-                print(f"Error processing {current_path}: {str(e)}")
+                print(f"Error processing {from_path}: {str(e)}")
+                continue
+            if not reasons and search is not None and not search.has(from_path, manifest.built_from(from_path)):
+                reasons = ["search index out of date"]
+            if not reasons and sitemap is not None and not sitemap.has(from_path, manifest.built_from(from_path)):
+                reasons = ["sitemap out of date"]
+            if not reasons and links is not None and not links.has(from_path, manifest.built_from(from_path)):
+                reasons = ["links out of date"]
+            if not reasons:
+                continue
+            if explain:
+                print(f"Rebuilding {from_path}: {', '.join(reasons)}")
+        if template is None:
+            template = Template.load(template_path, basepath, assets, images, minify, styles)
+        stale.append((from_path, template, dest_path, basepath, cache, search is not None, collect_links))
+    if profiler is not None:
+        for job in stale:
+            with profiler.page(job[0]) as profile:
+                result = generate_page_job(job, profile)
+            page_done(job, result, manifest, inputs, compressor, search, sitemap, links, assets, images)
+    elif jobs > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = max(1, len(stale) // (jobs * 4))
+            results = executor.map(generate_page_job, stale, chunksize=chunksize)
+            for job, result in zip(stale, results):
+                page_done(job, result, manifest, inputs, compressor, search, sitemap, links, assets, images)
+    else:
+        for job in stale:
+            page_done(job, generate_page_job(job), manifest, inputs, compressor, search, sitemap, links, assets, images)
+    return len(stale)
+
+def page_done(job, result, manifest, inputs, compressor, search, sitemap, links, assets, images):
+    from_path, dest_path = job[0], job[2]
+    error, document = result
+    if error is not None:
+        if manifest is not None:
+            manifest.forget(from_path)
+        print(f"Error processing {from_path}: {error}")
+        return
+    print(f"Generated: {dest_path}")
+    if manifest is not None:
+        references = None if document.links is None else reference_inputs(document.links, assets, images)
+        manifest.record(from_path, dest_path, inputs, references)
+    if compressor is not None:
+        compressor.submit(dest_path)
+    source_hash = None if manifest is None else manifest.built_from(from_path)
+    if search is not None:
+        search.update(from_path, dest_path, document, source_hash)
+    if sitemap is not None:
+        sitemap.update(from_path, dest_path, document, source_hash)
+    if links is not None:
+        links.update(from_path, dest_path, document, source_hash)
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, manifest=None, inputs=None, jobs=1, profiler=None, cache=None, explain=False, assets=None, compressor=None, images=None, minify=False, styles=None, search=None, sitemap=None, links=None):
+    pages = collect_pages(dir_path_content, dest_dir_path)
+    return generate_pages(pages, template_path, basepath, manifest, inputs, jobs, profiler, cache, explain, assets, compressor, images, minify, styles, search, sitemap, links)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+import os
+import posixpath
+import re
+from manifest import hash_bytes
+
+# what fits in the first round trip of a new connection
+INLINE_THRESHOLD = 14 * 1024
+LINK_TAG = re.compile(r'<link((?:\s+[\w-]+(?:="[^"]*")?)*)\s*/?>')
+LINK_ATTR = re.compile(r'\s+([\w-]+)(?:="([^"]*)")?')
+CSS_TOKEN = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|/\*.*?\*/|\s+", re.DOTALL)
+CSS_PUNCTUATION = re.compile(r"\s*;\s*(})\s*|\s*([{};,>])\s*|(:)\s+")
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]*)\1\s*\)")
+
+
+class Stylesheets:
+    # stylesheets from static/ linked by the template. Each is read and
+    # processed once per build; the result is shared by every page. Ones up
+    # to threshold bytes are inlined as <style>, larger ones stay linked and
+    # get a preload hint.
+    def __init__(self, static_path, threshold=INLINE_THRESHOLD):
+        self.static_path = static_path
+        self.threshold = threshold
+        self.processed = {}
+
+    def load(self, href):
+        # the processed CSS, or None when the stylesheet stays external
+        if href not in self.processed:
+            path = os.path.join(self.static_path, *href.lstrip("/").split("/"))
+            css = None
+            if os.path.isfile(path) and os.path.getsize(path) <= self.threshold:
+                with open(path, "r") as f:
+                    css = minify_css(f.read())
+            self.processed[href] = css
+        return self.processed[href]
+
+    def apply(self, text, basepath="/", assets=None):
+        def replace(match):
+            attrs = dict(LINK_ATTR.findall(match.group(1)))
+            href = attrs.get("href", "")
+            if attrs.get("rel") != "stylesheet" or not href.startswith("/") or href.startswith("//"):
+                return match.group(0)
+            css = self.load(href)
+            if css is None:
+                return f'<link rel="preload" href="{href}" as="style">{match.group(0)}'
+            css = rewrite_css_urls(css, href, basepath, assets or {})
+            media = attrs.get("media")
+            if media and media != "all":
+                return f'<style media="{media}">{css}</style>'
+            return f"<style>{css}</style>"
+        return LINK_TAG.sub(replace, text)
+
+    def fingerprint(self, assets=None):
+        # changes whenever any stylesheet that could be inlined changes, or
+        # the hashed name of a file one of them references
+        parts = [str(self.threshold)]
+        for root, dirs, files in os.walk(self.static_path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".css"):
+                    path = os.path.join(root, name)
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    if assets:
+                        href = "/" + os.path.relpath(path, self.static_path).replace(os.sep, "/")
+                        data = rewrite_css_urls(data.decode("utf-8", "surrogateescape"), href, "/", assets).encode("utf-8", "surrogateescape")
+                    parts.append(f"{path}:{hash_bytes(data)}")
+        return hash_bytes("\0".join(parts).encode())
+
+    def reset(self):
+        self.processed = {}
+
+
+def minify_css(css):
+    # drops comments and insignificant whitespace; strings are kept as written
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        return "" if match.group(0).startswith("/*") else " "
+    css = CSS_TOKEN.sub(replace, css)
+    parts = re.split(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')", css)
+    for i in range(0, len(parts), 2):
+        # a space before ":" can matter in selectors (a :hover), one after it never does
+        parts[i] = CSS_PUNCTUATION.sub(lambda m: m.group(1) or m.group(2) or m.group(3), parts[i])
+    return "".join(parts).strip()
+
+
+def rewrite_css_urls(css, css_href, basepath, assets):
+    # relative url()s were relative to the stylesheet; once inlined they would
+    # resolve against the page, so they are made site-absolute
+    def replace(match):
+        quote, url = match.groups()
+        if not url or url.startswith(("/", "#", "data:")) or ":" in url.split("/")[0]:
+            return match.group(0)
+        absolute = posixpath.normpath(posixpath.join(posixpath.dirname(css_href), url))
+        absolute = assets.get(absolute, absolute)
+        return f"url({quote}{basepath}{absolute[1:]}{quote})"
+    return CSS_URL.sub(replace, css)
+
+
+def rewrite_css_assets(css, css_href, assets):
+    # points the url()s of a fingerprinted stylesheet at the hashed names of
+    # the files they reference; relative urls stay relative
+    def replace(match):
+        quote, url = match.groups()
+        path = url.split("#", 1)[0].split("?", 1)[0]
+        if not path or path.startswith(("//", "data:")) or ":" in path.split("/")[0]:
+            return match.group(0)
+        if path.startswith("/"):
+            hashed = assets.get(path)
+        else:
+            hashed = assets.get(posixpath.normpath(posixpath.join(posixpath.dirname(css_href), path)))
+            if hashed is not None:
+                hashed = posixpath.relpath(hashed, posixpath.dirname(css_href))
+        if hashed is None:
+            return match.group(0)
+        return f"url({quote}{hashed}{url[len(path):]}{quote})"
+    return CSS_URL.sub(replace, css)
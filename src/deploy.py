@@ -0,0 +1,60 @@
+import json
+import os
+from manifest import CACHE_DIR, hash_file
+
+DEPLOY_STATE_PATH = os.path.join(CACHE_DIR, "deploy")
+DELTA_PATH = os.path.join(CACHE_DIR, "delta.json")
+
+
+class DeployDelta:
+    # what changed in docs/ since the previous build, for deploy tooling that
+    # uploads only the difference. Every output file's size, mtime and hash
+    # is kept in .build-cache; a file is only hashed again when its size or
+    # mtime moved, which unchanged output no longer does.
+    def __init__(self, dest_dir, state_path=DEPLOY_STATE_PATH):
+        self.dest_dir = dest_dir
+        self.state_path = state_path
+        try:
+            with open(state_path, "r") as f:
+                self.files = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.files = {}
+
+    def scan(self):
+        # {"added": [...], "changed": [...], "removed": [...]}, as site paths
+        # relative to dest_dir
+        files = {}
+        delta = {"added": [], "changed": [], "removed": []}
+        for root, dirs, names in os.walk(self.dest_dir):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                rel_path = os.path.relpath(path, self.dest_dir).replace(os.sep, "/")
+                st = os.stat(path)
+                entry = self.files.get(rel_path)
+                if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                    files[rel_path] = entry
+                    continue
+                files[rel_path] = [st.st_size, st.st_mtime_ns, hash_file(path)]
+                if entry is None:
+                    delta["added"].append(rel_path)
+                elif entry[2] != files[rel_path][2]:
+                    delta["changed"].append(rel_path)
+        delta["removed"] = sorted(rel_path for rel_path in self.files if rel_path not in files)
+        self.files = files
+        return delta
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.files, f, separators=(",", ":"))
+        os.replace(tmp_path, self.state_path)
+
+
+def write_delta(delta, path=DELTA_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(delta, f, indent=1)
+    os.replace(tmp_path, path)
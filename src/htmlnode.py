@@ -1,6 +1,14 @@
+import sys
+
+VOID_ELEMENTS = frozenset(("img", "br", "hr", "input", "meta", "link"))
+
 class HTMLNode:
+    # large pages create hundreds of thousands of nodes; slots keep each one
+    # small and interned tags let them all share the same few strings
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
-        self.tag = tag
+        self.tag = sys.intern(tag) if tag else tag
         self.value = value
         self.children = children
         self.props = props
@@ -21,10 +29,14 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag, value, None, props)
     
     def to_html(self):
+        if self.tag in VOID_ELEMENTS:
+            return f"<{self.tag}{super().props_to_html()}>"
         if not self.value:
             raise ValueError("All leaf nodes must have a value.")
         if not self.tag:
@@ -34,23 +46,35 @@ class LeafNode(HTMLNode):
     
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
     
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def write_html(self, f):
+        f.writelines(self.iter_html())
+
+    def iter_html(self):
+        # walks the tree with an explicit stack and yields tags and leaf markup
+        # as it goes, so nothing is built up by repeated concatenation
         if not self.tag:
             raise ValueError("Parent node must have a tag")
         if not self.children:
             raise ValueError("Parent node must have children")
-        def traverse_nodes(children):
-            html_text = f""
+        yield f"<{self.tag}{self.props_to_html()}>"
+        stack = [(self.tag, iter(self.children))]
+        while stack:
+            tag, children = stack[-1]
             for child in children:
                 if isinstance(child, LeafNode):
-                    html_text += child.to_html()
+                    yield child.to_html()
                 elif isinstance(child, ParentNode):
-                    html_text += f"<{child.tag}{child.props_to_html()}>" + traverse_nodes(child.children) + f"</{child.tag}{child.props_to_html()}>"
-            return html_text
-        text = f"<{self.tag}{self.props_to_html()}>" + traverse_nodes(self.children) + f"</{self.tag}>"
-        return text
-
-
+                    yield f"<{child.tag}{child.props_to_html()}>"
+                    stack.append((child.tag, iter(child.children or ())))
+                    break
+            else:
+                stack.pop()
+                yield f"</{tag}>"
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+import struct
+from manifest import CACHE_DIR, IMAGE_EXTENSIONS
+
+IMAGE_INDEX_PATH = os.path.join(CACHE_DIR, "images")
+IMG_TAG = re.compile(r'<img((?:\s+[\w-]+="[^"]*")*)\s*/?>')
+IMG_ATTR = re.compile(r'\s+([\w-]+)="([^"]*)"')
+# JPEG start-of-frame markers; C4, C8 and CC share the range but aren't frames
+JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def image_size(path):
+    # (width, height) from the file header alone, or None if the format isn't
+    # recognised
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return webp_size(head)
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return jpeg_size(f)
+    return None
+
+
+def webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and head[20:21] == b"\x2f":
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def jpeg_size(f):
+    # walk the segments, seeking over their payloads, up to the first frame
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker in JPEG_SOF:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+class ImageIndex:
+    # dimensions of every image under static/, by site URL. Entries are kept
+    # between builds and reused while the file's size and mtime are unchanged.
+    def __init__(self, static_path, path=IMAGE_INDEX_PATH):
+        self.static_path = static_path
+        self.path = path
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def scan(self):
+        entries = {}
+        sizes = {}
+        for root, dirs, files in os.walk(self.static_path):
+            for name in files:
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                entry = self.entries.get(path)
+                if entry is None or entry[0] != st.st_size or entry[1] != st.st_mtime_ns:
+                    try:
+                        size = image_size(path)
+                    except (OSError, struct.error):
+                        size = None
+                    entry = [st.st_size, st.st_mtime_ns, size]
+                entries[path] = entry
+                if entry[2]:
+                    rel_path = os.path.relpath(path, self.static_path)
+                    sizes["/" + rel_path.replace(os.sep, "/")] = tuple(entry[2])
+        self.entries = entries
+        return sizes
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def add_image_attributes(text, images):
+    # every <img> is loaded lazily and decoded off the main thread; images
+    # found in the index also get their dimensions, so the page doesn't shift
+    # as they arrive
+    def replace(match):
+        attrs = dict(IMG_ATTR.findall(match.group(1)))
+        extra = []
+        size = images.get(attrs.get("src"))
+        if size is not None and "width" not in attrs and "height" not in attrs:
+            extra.append(f'width="{size[0]}" height="{size[1]}"')
+        if "loading" not in attrs:
+            extra.append('loading="lazy"')
+        if "decoding" not in attrs:
+            extra.append('decoding="async"')
+        if not extra:
+            return match.group(0)
+        return f'<img{match.group(1)} {" ".join(extra)}>'
+    return IMG_TAG.sub(replace, text)
@@ -0,0 +1,98 @@
+import json
+import os
+import posixpath
+from urllib.parse import unquote
+from manifest import CACHE_DIR, parser_version
+
+LINKS_STATE_PATH = os.path.join(CACHE_DIR, "links")
+LINKS_VERSION = 2
+
+
+class LinkChecker:
+    # every href and src of every page, collected while the page is parsed
+    # and kept in .build-cache so fresh pages don't need parsing again.
+    # check() resolves the internal ones against the generated pages and the
+    # files in static/; each link costs one or two set lookups.
+    def __init__(self, dest_dir, state_path=LINKS_STATE_PATH):
+        self.dest_dir = dest_dir
+        self.state_path = state_path
+        self.pages = {}
+        self.changed = True
+        try:
+            with open(state_path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == LINKS_VERSION and data.get("parser") == parser_version():
+            self.pages = data["pages"]
+            self.changed = False
+
+    def has(self, source_path, source_hash):
+        # whether the links come from this version of the source; a build
+        # without the link checker can have rebuilt the page since
+        page = self.pages.get(source_path)
+        return page is not None and page["source"] == source_hash
+
+    def update(self, source_path, dest_path, document, source_hash=None):
+        page = {
+            "path": os.path.relpath(dest_path, self.dest_dir).replace(os.sep, "/"),
+            "links": sorted(set(document.links)),
+            "source": source_hash,
+        }
+        if self.pages.get(source_path) != page:
+            self.pages[source_path] = page
+            self.changed = True
+
+    def remove(self, source_path):
+        if self.pages.pop(source_path, None) is not None:
+            self.changed = True
+
+    def prune(self, source_paths):
+        for source_path in [path for path in self.pages if path not in source_paths]:
+            self.remove(source_path)
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": LINKS_VERSION, "parser": parser_version(), "pages": self.pages}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.state_path)
+        self.changed = False
+
+    def targets(self, static_path):
+        # site paths that exist, without a leading slash
+        targets = {page["path"] for page in self.pages.values()}
+        for root, dirs, files in os.walk(static_path):
+            rel_root = os.path.relpath(root, static_path)
+            for name in files:
+                targets.add(posixpath.normpath(os.path.join(rel_root, name).replace(os.sep, "/")))
+        return targets
+
+    def check(self, static_path):
+        # (source, link) for every internal link that leads nowhere
+        targets = self.targets(static_path)
+        broken = []
+        for source_path, page in sorted(self.pages.items()):
+            for link in page["links"]:
+                path = link_target(link, page["path"])
+                if path is None:
+                    continue
+                if path in targets or (f"{path}/index.html" if path else "index.html") in targets:
+                    continue
+                broken.append((source_path, link))
+        return broken
+
+
+def link_target(link, page_path):
+    # the site path an internal link points at, or None for external links,
+    # fragments on the same page and other schemes
+    path = link.split("#", 1)[0].split("?", 1)[0]
+    if not path or path.startswith("//") or ":" in path.split("/", 1)[0]:
+        return None
+    path = unquote(path)
+    if not path.startswith("/"):
+        path = posixpath.join(posixpath.dirname(page_path), path)
+    path = posixpath.normpath(path.lstrip("/"))
+    return "" if path == "." else path
@@ -1,19 +1,107 @@
 # print("hello world")
 from textnode import TextNode, TextType
-from copy_contents import copy_files, generate_pages_recursive
+from compress import Compressor
+from copy_contents import LINK_MODES, copy_files, generate_pages_recursive, remove_outputs
+from css import INLINE_THRESHOLD, Stylesheets
+from deploy import DELTA_PATH, DeployDelta, write_delta
+from images import ImageIndex
+from links import LinkChecker
+from manifest import CACHE_DIR, BuildManifest
+from parse_cache import ParseCache
+from profiler import BuildProfiler
+from search import SearchIndex
+from sitemap import SiteMap
+from watch import Watcher
+import argparse
 import os
 import sys
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate the site in docs/ from content/ and static/.")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument("--force", action="store_true", help="rebuild every page regardless of the build manifest")
+    parser.add_argument("--check-links", action="store_true", help="report internal links and images that point at nothing; exit with status 1 if there are any")
+    parser.add_argument("--compress", action="store_true", help="write .gz (and .zst/.br when available) siblings of pages and text assets")
+    parser.add_argument("--delta", default=DELTA_PATH, metavar="FILE", help=f"where to write the paths added, changed and removed in docs/ by this build (default {DELTA_PATH})")
+    parser.add_argument("--explain", action="store_true", help="print why each rebuilt page is out of date")
+    parser.add_argument("--link", choices=LINK_MODES, default="copy", help="how static files are placed in docs/")
+    parser.add_argument("--fingerprint", action="store_true", help="write static files under content-hashed names and rewrite references to them")
+    parser.add_argument("--inline-css", nargs="?", type=int, const=INLINE_THRESHOLD, metavar="BYTES",
+                        help=f"inline stylesheets up to BYTES (default {INLINE_THRESHOLD}) into each page, preload larger ones")
+    parser.add_argument("--minify", action="store_true", help="minify the generated HTML")
+    parser.add_argument("--no-parse-cache", action="store_true", help="parse every rebuilt page instead of reusing cached bodies")
+    parser.add_argument("--search", action="store_true", help="write a sharded client-side search index to docs/search/")
+    parser.add_argument("--sitemap", metavar="SITE_URL", help="write sitemap.xml and an Atom feed of content/blog/ for the site served at SITE_URL")
+    parser.add_argument("--watch", action="store_true", help="after building, keep rebuilding changed pages and assets")
+    parser.add_argument("--profile", nargs="?", const=os.path.join(CACHE_DIR, "profile.json"), metavar="FILE",
+                        help="time each page's stages and write a report (a Chrome trace if FILE ends in .trace.json)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="render pages in N worker processes (0 = one per CPU)")
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error("--jobs must be 0 or a positive number")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
 def main():
-    if len(sys.argv) == 1:
-        basepath = "/"
-    else:
-        basepath = sys.argv[1]
-    copy_files()
+    args = parse_args(sys.argv[1:])
+    basepath = args.basepath
+    static = os.path.normpath(os.path.join("src", "../static"))
     source = os.path.normpath(os.path.join("src", "../content/"))
     destination = os.path.normpath(os.path.join("src", "../docs/"))
     template = os.path.normpath(os.path.join("src", "../template.html"))
-    generate_pages_recursive(source, template, destination, basepath)
+    assets = {} if args.fingerprint else None
+    copy_files(static, destination, link=args.link, assets=assets)
+    image_index = ImageIndex(static)
+    images = image_index.scan()
+    image_index.save()
+    styles = None if args.inline_css is None else Stylesheets(static, args.inline_css)
+    search = SearchIndex(destination, basepath) if args.search else None
+    sitemap = SiteMap(destination, args.sitemap, basepath) if args.sitemap else None
+    links = LinkChecker(destination) if args.check_links else None
+    manifest = BuildManifest.load(force=args.force)
+    build_profiler = BuildProfiler() if args.profile else None
+    cache = None if args.no_parse_cache else ParseCache()
+    compressor = Compressor() if args.compress else None
+    generate_pages_recursive(source, template, destination, basepath, manifest, jobs=args.jobs, profiler=build_profiler, cache=cache, explain=args.explain, assets=assets, compressor=compressor, images=images, minify=args.minify, styles=styles, search=search, sitemap=sitemap, links=links)
+    orphans = manifest.save()
+    if orphans:
+        print(f"Removed {remove_outputs(destination, orphans)} file(s) of deleted pages")
+    if search is not None:
+        search.prune(manifest.seen)
+        print(f"Search index: {search.write()} file(s) written")
+    if sitemap is not None:
+        sitemap.prune(manifest.seen)
+        print(f"Sitemap and feed: {sitemap.write()} file(s) written")
+    broken = []
+    if links is not None:
+        links.prune(manifest.seen)
+        links.save()
+        broken = links.check(static)
+        report_broken_links(broken)
+    if compressor is not None:
+        compressor.sweep(destination)
+        print(f"Compressed {compressor.finish()} file(s)")
+    deploy = DeployDelta(destination)
+    delta = deploy.scan()
+    deploy.save()
+    write_delta(delta, args.delta)
+    print(f"Deploy delta: {len(delta['added'])} added, {len(delta['changed'])} changed, {len(delta['removed'])} removed ({args.delta})")
+    if cache is not None:
+        cache.prune(entry["hash"] for entry in manifest.entries.values())
+    if build_profiler is not None:
+        build_profiler.stop()
+        build_profiler.write(args.profile)
+        print(f"Profile written to {args.profile}")
+    if args.watch:
+        Watcher(source, static, template, destination, basepath, manifest, args.link, assets=assets, compressor=compressor, image_index=image_index, minify=args.minify, styles=styles, search=search, sitemap=sitemap, links=links).run()
+    elif broken:
+        sys.exit(1)
+
+def report_broken_links(broken):
+    for source, link in broken:
+        print(f"Broken link in {source}: {link}")
+    print(f"{len(broken)} broken link(s)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
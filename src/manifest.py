@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+
+CACHE_DIR = ".build-cache"
+MANIFEST_PATH = os.path.join(CACHE_DIR, "manifest")
+MANIFEST_VERSION = 2
+PARSER_MODULES = ("blocknodes", "conversion_functions", "htmlnode", "textnode")
+# everything between the parsed document and the bytes on disk
+RENDERER_MODULES = ("copy_contents", "css", "images", "template")
+# what pages and stylesheets reference; other static files keep their names
+FINGERPRINT_EXTENSIONS = frozenset((
+    ".css", ".js", ".mjs", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+))
+# the images whose size is read
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_version(modules):
+    # any edit to these modules changes every page built with them
+    digest = hashlib.sha256()
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in modules:
+        with open(os.path.join(source_dir, module + ".py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def parser_version():
+    return source_version(PARSER_MODULES)
+
+
+def build_inputs(template_path, basepath, assets=None, images=None, minify=False, styles=None, references=()):
+    # the inputs every page depends on besides its own source, by name, with
+    # the fingerprint each has in this build. references are the URLs the
+    # template itself links to; only their hashed names and image sizes
+    # concern every page.
+    inputs = {
+        f"template:{template_path}": hash_file(template_path),
+        "basepath": basepath,
+        "parser": parser_version(),
+        "renderer": source_version(RENDERER_MODULES),
+    }
+    if assets is not None or images is not None:
+        shared = reference_inputs(references, assets, images)
+        if assets is not None:
+            inputs["assets"] = hash_bytes(json.dumps({name: value for name, value in shared.items() if name.startswith("asset:")}, sort_keys=True).encode())
+        if images is not None:
+            inputs["images"] = hash_bytes(json.dumps({name: value for name, value in shared.items() if name.startswith("image:")}, sort_keys=True).encode())
+    if minify:
+        inputs["minify"] = source_version(("minify",))
+    if styles is not None:
+        inputs["styles"] = styles.fingerprint(assets)
+    return inputs
+
+
+def reference_inputs(urls, assets=None, images=None):
+    # a page's own dependencies: the hashed name and the image size of every
+    # site-absolute URL it references that could be a fingerprinted file or
+    # an image, found or not, so a page is only rebuilt for the static files
+    # it actually uses and picks up one that appears later
+    inputs = {}
+    for url in urls:
+        if not url.startswith("/") or url.startswith("//"):
+            continue
+        extension = os.path.splitext(url.split("#", 1)[0].split("?", 1)[0])[1].lower()
+        if assets is not None and extension in FINGERPRINT_EXTENSIONS:
+            inputs[f"asset:{url}"] = assets.get(url)
+        if images is not None and extension in IMAGE_EXTENSIONS:
+            size = images.get(url)
+            inputs[f"image:{url}"] = None if size is None else f"{size[0]}x{size[1]}"
+    return inputs
+
+
+def is_reference_input(name):
+    return name.startswith(("asset:", "image:"))
+
+
+class BuildManifest:
+    # the build's dependency graph: for every page source, its output and the
+    # fingerprint of each input it was built from. A page is rebuilt exactly
+    # when one of those fingerprints no longer matches. With force every
+    # page is stale, but the entries are kept so the outputs of deleted
+    # pages are still found.
+    def __init__(self, path=MANIFEST_PATH, entries=None, force=False):
+        self.path = path
+        self.entries = entries or {}
+        self.force = force
+        self.seen = set()
+        # the file on disk is only rewritten when an entry changed
+        self.changed = entries is None
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH, force=False):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return cls(path, force=force)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path, force=force)
+        return cls(path, data.get("pages", {}), force)
+
+    def source_hash(self, source_path):
+        # size and mtime let an untouched file skip rehashing entirely
+        st = os.stat(source_path)
+        entry = self.entries.get(source_path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["hash"], st
+        return hash_file(source_path), st
+
+    def stale_reasons(self, source_path, dest_path, inputs, assets=None, images=None):
+        # why the page has to be rebuilt; empty when it is up to date. assets
+        # and images are checked against the references the page was built
+        # with.
+        self.seen.add(source_path)
+        entry = self.entries.get(source_path)
+        if not entry:
+            return ["new page"]
+        if self.force:
+            return ["forced"]
+        reasons = []
+        if entry["dest"] != dest_path:
+            reasons.append("output path changed")
+        deps = entry["deps"]
+        for name, fingerprint in inputs.items():
+            if name not in deps:
+                reasons.append(f"new dependency {name}")
+            elif deps[name] != fingerprint:
+                reasons.append(f"{name} changed")
+        references = [name for name in deps if is_reference_input(name)]
+        if references:
+            current = reference_inputs((name.split(":", 1)[1] for name in references), assets, images)
+            for name in references:
+                if current.get(name) != deps[name]:
+                    reasons.append(f"{name} changed")
+        for name in deps:
+            if name not in inputs and not is_reference_input(name):
+                reasons.append(f"dependency {name} removed")
+        if not os.path.exists(dest_path):
+            reasons.append("output missing")
+        source_hash, st = self.source_hash(source_path)
+        if source_hash != entry["hash"]:
+            reasons.append("source changed")
+        elif not reasons and (entry["size"], entry["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+            entry["size"] = st.st_size
+            entry["mtime_ns"] = st.st_mtime_ns
+            self.changed = True
+        return reasons
+
+    def record(self, source_path, dest_path, inputs, references=None):
+        # references are the page's reference_inputs
+        source_hash, st = self.source_hash(source_path)
+        self.seen.add(source_path)
+        entry = {
+            "hash": source_hash,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "dest": dest_path,
+            "deps": dict(inputs, **(references or {})),
+        }
+        if self.entries.get(source_path) != entry:
+            self.entries[source_path] = entry
+            self.changed = True
+
+    def built_from(self, source_path):
+        # the hash of the source the page was last built from
+        entry = self.entries.get(source_path)
+        return None if entry is None else entry["hash"]
+
+    def forget(self, source_path):
+        if self.entries.pop(source_path, None) is not None:
+            self.changed = True
+
+    def dependents(self, name):
+        # sources of the pages built from the named input
+        return sorted(source for source, entry in self.entries.items() if name in entry["deps"])
+
+    def save(self):
+        # pages whose source disappeared since the last build are dropped;
+        # returns the outputs they leave behind, unless another page now
+        # writes to the same path
+        pages = {path: entry for path, entry in self.entries.items() if path in self.seen}
+        kept = {entry["dest"] for entry in pages.values()}
+        orphans = sorted(entry["dest"] for path, entry in self.entries.items() if path not in self.seen and entry["dest"] not in kept)
+        if len(pages) == len(self.entries) and not self.changed and os.path.exists(self.path):
+            return orphans
+        self.entries = pages
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            # dumps encodes in C; dump streams through the pure-Python encoder
+            f.write(json.dumps({"version": MANIFEST_VERSION, "pages": pages}, sort_keys=True))
+        os.replace(tmp_path, self.path)
+        self.changed = False
+        return orphans
@@ -0,0 +1,173 @@
+import re
+
+# collapsible whitespace is ASCII only; a non-breaking space is content
+WHITESPACE = re.compile(r"[ \t\n\r\f]+")
+TOKEN = re.compile(
+    r"(?P<text>[^<]+)"
+    r"|(?P<comment><!--.*?-->)"
+    r"|(?P<decl><!(?!--)[^>]*>)"
+    r"|(?P<tag></?(?P<name>[a-zA-Z][a-zA-Z0-9-]*)(?P<attrs>(?:[^>\"']|\"[^\"]*\"|'[^']*')*)>)"
+    r"|<",
+    re.DOTALL,
+)
+ATTR = re.compile(r"[ \t\n\r\f]*([^ \t\n\r\f\"'=<>/]+)(?:[ \t\n\r\f]*=[ \t\n\r\f]*(\"[^\"]*\"|'[^']*'|[^ \t\n\r\f>\"']+))?|[ \t\n\r\f]*/?[ \t\n\r\f]*$")
+UNQUOTED_VALUE = re.compile(r"[^ \t\n\r\f\"'=<>`]+")
+TAG_START = re.compile(r"<[a-zA-Z/!]")
+# elements whose contents are passed through byte for byte
+RAW_ELEMENTS = frozenset(("pre", "textarea", "script", "style"))
+# whitespace next to these never renders, so it is dropped instead of collapsed
+BLOCK_ELEMENTS = frozenset((
+    "html", "head", "body", "title", "meta", "link", "base", "script", "style", "noscript",
+    "article", "aside", "blockquote", "div", "dl", "dt", "dd", "figure", "figcaption", "footer",
+    "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+    "pre", "section", "table", "tbody", "thead", "tfoot", "tr", "td", "th", "ul",
+))
+VOID_ELEMENTS = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"))
+RAW_END = {name: re.compile(f"</{name}", re.IGNORECASE) for name in RAW_ELEMENTS}
+# longest stretch held back while waiting for a tag to be completed
+MAX_PENDING = 64 * 1024
+
+
+def minify_chunks(chunks):
+    # minifies a stream of HTML chunks as it goes; only an unfinished tag,
+    # comment or raw element closing tag is ever held between chunks
+    minifier = Minifier()
+    for chunk in chunks:
+        out = minifier.feed(chunk)
+        if out:
+            yield out
+    yield minifier.close()
+
+
+def minify_html(html):
+    return "".join(minify_chunks([html]))
+
+
+class Minifier:
+    def __init__(self):
+        self.buffer = ""
+        self.raw = None
+        self.space = False
+        self.after_block = True
+        # pages repeat the same few tags; each is only taken apart once
+        self.tags = {}
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        return self.process(False)
+
+    def close(self):
+        return self.process(True)
+
+    def process(self, final):
+        out = []
+        buffer = self.buffer
+        pos = 0
+        while pos < len(buffer):
+            if self.raw is not None:
+                match = RAW_END[self.raw].search(buffer, pos)
+                if match is None:
+                    # keep enough back to spot a closing tag split across chunks
+                    keep = 0 if final else len(self.raw) + 1
+                    split = max(pos, len(buffer) - keep)
+                    out.append(buffer[pos:split])
+                    pos = split
+                    break
+                out.append(buffer[pos:match.start()])
+                pos = match.start()
+                self.raw = None
+                continue
+            match = TOKEN.match(buffer, pos)
+            kind = match.lastgroup
+            if kind == "text":
+                self.text(match.group(0), out)
+            elif kind == "tag":
+                source = match.group(0)
+                known = self.tags.get(source)
+                if known is None:
+                    known = classify_tag(match)
+                    if len(self.tags) < 4096:
+                        self.tags[source] = known
+                self.tag(known[0], known[1], out)
+                self.raw = known[2]
+            elif kind == "comment":
+                if match.group(0).startswith("<!--[if"):
+                    self.tag(match.group(0), True, out)
+            elif kind == "decl":
+                self.tag(match.group(0), True, out)
+            elif not final and len(buffer) - pos < MAX_PENDING and could_be_tag(buffer, pos):
+                # wait for the rest of the tag or comment
+                break
+            else:
+                # not a tag after all, e.g. a literal "<" in text
+                self.text("<", out)
+            pos = match.end()
+        self.buffer = buffer[pos:]
+        if final and self.space and not self.after_block:
+            out.append(" ")
+        return "".join(out)
+
+    def text(self, text, out):
+        text = WHITESPACE.sub(" ", text)
+        if text.startswith(" "):
+            self.space = True
+            text = text[1:]
+        if not text:
+            return
+        trailing = text.endswith(" ")
+        if trailing:
+            text = text[:-1]
+        if self.space and not self.after_block:
+            out.append(" ")
+        out.append(text)
+        self.space = trailing
+        self.after_block = False
+
+    def tag(self, tag, block, out):
+        if self.space and not block and not self.after_block:
+            out.append(" ")
+        out.append(tag)
+        self.space = False
+        self.after_block = block
+
+
+def could_be_tag(buffer, pos):
+    return pos == len(buffer) - 1 or TAG_START.match(buffer, pos) is not None
+
+
+def classify_tag(match):
+    # (minified tag, whether it is block level, raw element it opens)
+    name = match.group("name").lower()
+    closing = match.group(0)[1] == "/"
+    raw = None if closing or name not in RAW_ELEMENTS else name
+    return minify_tag(match, name, closing), name in BLOCK_ELEMENTS, raw
+
+
+def minify_tag(match, name, closing):
+    if closing:
+        return f"</{name}>"
+    attrs = []
+    end = 0
+    source = match.group("attrs")
+    for attr in ATTR.finditer(source):
+        if attr.start() != end or not attr.group(0):
+            break
+        end = attr.end()
+        if attr.group(1) is None:
+            continue
+        value = attr.group(2)
+        if value is None:
+            attrs.append(attr.group(1))
+            continue
+        if value[0] in "\"'" and UNQUOTED_VALUE.fullmatch(value[1:-1]):
+            value = value[1:-1]
+        attrs.append(f"{attr.group(1)}={value}")
+    if end != len(source):
+        # attributes we can't take apart safely are left as they were
+        return match.group(0)
+    if not attrs:
+        return f"<{name}>"
+    if name not in VOID_ELEMENTS and source.rstrip().endswith("/"):
+        attrs.append("/")
+    tag = f"<{name} {' '.join(attrs)}>"
+    return tag
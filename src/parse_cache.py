@@ -0,0 +1,53 @@
+import json
+import os
+from blocknodes import Document
+from manifest import CACHE_DIR, parser_version
+
+PARSE_CACHE_DIR = os.path.join(CACHE_DIR, "pages")
+
+
+class ParseCache:
+    # rendered body HTML plus title and headings, stored per source content
+    # hash and parser version, so pages can be refilled into a new template
+    # without parsing their markdown again
+    def __init__(self, path=PARSE_CACHE_DIR, version=None):
+        self.path = path
+        self.version = version or parser_version()
+
+    def entry_path(self, source_hash):
+        return os.path.join(self.path, source_hash[:2], f"{source_hash}-{self.version}.json")
+
+    def load(self, source_hash):
+        try:
+            with open(self.entry_path(source_hash), "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        document = Document(None, data["title"], [tuple(heading) for heading in data["headings"]], data.get("terms"), data.get("links"))
+        document.body = data["body"]
+        return document
+
+    def store(self, source_hash, document):
+        path = self.entry_path(source_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            entry = {"title": document.title, "headings": document.headings, "body": document.body}
+            if document.terms is not None:
+                entry["terms"] = document.terms
+            if document.links is not None:
+                entry["links"] = document.links
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def prune(self, keep_hashes):
+        keep = {f"{source_hash}-{self.version}.json" for source_hash in keep_hashes}
+        removed = 0
+        for root, dirs, files in os.walk(self.path, topdown=False):
+            for name in files:
+                if name not in keep:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+            if root != self.path and not os.listdir(root):
+                os.rmdir(root)
+        return removed
@@ -0,0 +1,112 @@
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+STAGES = ("read", "blocks", "inline", "to_html", "template", "write")
+
+# the page being profiled, if any; parsing code adds its inline time here
+current = None
+
+
+class PageProfile:
+    __slots__ = ("path", "start", "stages", "events", "peak_bytes")
+
+    def __init__(self, path, start):
+        self.path = path
+        self.start = start
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.events = []
+        self.peak_bytes = 0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, started, time.perf_counter() - started)
+
+    def add(self, name, started, seconds):
+        self.stages[name] += seconds
+        self.events.append((name, started, seconds))
+
+    def total(self):
+        return sum(self.stages.values())
+
+
+class BuildProfiler:
+    def __init__(self, top=20):
+        self.top = top
+        self.pages = []
+        self.started = time.perf_counter()
+        self.peak_bytes = 0
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def page(self, path):
+        global current
+        page = PageProfile(path, time.perf_counter())
+        tracemalloc.reset_peak()
+        current = page
+        try:
+            yield page
+        finally:
+            current = None
+            page.peak_bytes = tracemalloc.get_traced_memory()[1]
+            self.peak_bytes = max(self.peak_bytes, page.peak_bytes)
+            self.pages.append(page)
+
+    def totals(self):
+        totals = dict.fromkeys(STAGES, 0.0)
+        for page in self.pages:
+            for name, seconds in page.stages.items():
+                totals[name] += seconds
+        return totals
+
+    def report(self):
+        slowest = sorted(self.pages, key=lambda page: page.total(), reverse=True)[: self.top]
+        return {
+            "pages": len(self.pages),
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "peak_bytes": self.peak_bytes,
+            "totals": {name: round(seconds, 6) for name, seconds in self.totals().items()},
+            "slowest": [
+                {
+                    "path": page.path,
+                    "seconds": round(page.total(), 6),
+                    "peak_bytes": page.peak_bytes,
+                    "stages": {name: round(seconds, 6) for name, seconds in page.stages.items()},
+                }
+                for page in slowest
+            ],
+        }
+
+    def chrome_trace(self):
+        # loadable in chrome://tracing and Perfetto
+        events = []
+        for page in self.pages:
+            events.append({
+                "name": page.path, "cat": "page", "ph": "X", "pid": 1, "tid": 1,
+                "ts": (page.start - self.started) * 1e6, "dur": page.total() * 1e6,
+                "args": {"peak_bytes": page.peak_bytes},
+            })
+            for name, started, seconds in page.events:
+                events.append({
+                    "name": name, "cat": "stage", "ph": "X", "pid": 1, "tid": 2,
+                    "ts": (started - self.started) * 1e6, "dur": seconds * 1e6,
+                    "args": {"page": page.path},
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": self.report()}
+
+    def write(self, path):
+        # *.trace.json gets the Chrome trace format, anything else the summary
+        data = self.chrome_trace() if path.endswith(".trace.json") else self.report()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def stop(self):
+        tracemalloc.stop()
@@ -0,0 +1,154 @@
+import json
+import os
+from copy_contents import replace_if_changed
+from manifest import CACHE_DIR, parser_version
+
+SEARCH_STATE_PATH = os.path.join(CACHE_DIR, "search")
+SEARCH_DIR = "search"
+SEARCH_VERSION = 2
+SHARD_PREFIX = 2
+
+
+def page_url(dest_path, dest_dir, basepath):
+    # the URL a generated page is served at; index.html is left off
+    rel_path = os.path.relpath(dest_path, dest_dir).replace(os.sep, "/")
+    if rel_path == "index.html":
+        rel_path = ""
+    elif rel_path.endswith("/index.html"):
+        rel_path = rel_path[: -len("index.html")]
+    return basepath + rel_path
+
+
+def shard_key(term):
+    # the first two characters of the term; anything that isn't a safe file
+    # name character is spelled out as its code point
+    return "".join(c if c.isascii() and c.isalnum() else f"_{ord(c):x}" for c in term[:SHARD_PREFIX])
+
+
+class SearchIndex:
+    # a client-side search index: docs/search/pages.json maps page ids to URL
+    # and title, and docs/search/<prefix>.json holds the postings of every term
+    # starting with that prefix as {term: [[page id, count, [positions]], ...]},
+    # so a browser fetches only the shards of the terms it looks up.
+    # The inverted index is kept in .build-cache between builds; rebuilt pages
+    # replace their own postings and only the shards they touch are rewritten.
+    def __init__(self, dest_dir, basepath="/", state_path=SEARCH_STATE_PATH):
+        self.dest_dir = dest_dir
+        self.basepath = basepath
+        self.state_path = state_path
+        self.pages = {}
+        self.shards = {}
+        self.next_id = 0
+        self.touched = set()
+        self.pages_changed = False
+        # without a usable state every shard is written and anything else
+        # already in docs/search is removed
+        self.full = True
+        try:
+            with open(state_path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == SEARCH_VERSION and data.get("basepath") == basepath and data.get("parser") == parser_version():
+            self.pages = data["pages"]
+            self.shards = data["shards"]
+            self.next_id = data["next_id"]
+            self.full = False
+
+    def has(self, source_path, source_hash):
+        # whether the page is indexed from this version of its source; a build
+        # without the index can have rebuilt it since
+        page = self.pages.get(source_path)
+        return page is not None and page["source"] == source_hash
+
+    def update(self, source_path, dest_path, document, source_hash=None):
+        page = self.pages.get(source_path)
+        if page is None:
+            page_id = str(self.next_id)
+            self.next_id += 1
+        else:
+            page_id = page["id"]
+            self.remove_postings(page)
+        url = page_url(dest_path, self.dest_dir, self.basepath)
+        if page is None or page["url"] != url or page["title"] != document.title:
+            self.pages_changed = True
+        terms = sorted(document.terms)
+        self.pages[source_path] = {"id": page_id, "url": url, "title": document.title, "terms": terms, "source": source_hash}
+        for term in terms:
+            key = shard_key(term)
+            self.shards.setdefault(key, {}).setdefault(term, {})[page_id] = document.terms[term]
+            self.touched.add(key)
+
+    def remove(self, source_path):
+        page = self.pages.pop(source_path, None)
+        if page is not None:
+            self.remove_postings(page)
+            self.pages_changed = True
+
+    def remove_postings(self, page):
+        page_id = page["id"]
+        for term in page["terms"]:
+            key = shard_key(term)
+            postings = self.shards[key][term]
+            postings.pop(page_id, None)
+            if not postings:
+                del self.shards[key][term]
+            self.touched.add(key)
+
+    def prune(self, source_paths):
+        # drops every page not in source_paths, i.e. whose source is gone
+        for source_path in [path for path in self.pages if path not in source_paths]:
+            self.remove(source_path)
+
+    def write(self):
+        # rewrites pages.json and the touched shards; returns how many files
+        # were written
+        out_dir = os.path.join(self.dest_dir, SEARCH_DIR)
+        os.makedirs(out_dir, exist_ok=True)
+        written = 0
+        if self.full:
+            keep = {"pages.json"} | {f"{key}.json" for key in self.shards}
+            for name in os.listdir(out_dir):
+                if name not in keep:
+                    os.remove(os.path.join(out_dir, name))
+            self.touched.update(self.shards)
+            self.pages_changed = True
+            self.full = False
+        if self.pages_changed or not os.path.exists(os.path.join(out_dir, "pages.json")):
+            pages = {page["id"]: [page["url"], page["title"]] for page in self.pages.values()}
+            write_json(os.path.join(out_dir, "pages.json"), pages)
+            written += 1
+        for key in sorted(self.touched):
+            path = os.path.join(out_dir, f"{key}.json")
+            terms = self.shards.get(key)
+            if not terms:
+                self.shards.pop(key, None)
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            shard = {
+                term: [[int(page_id), count, positions] for page_id, (count, positions) in sorted(postings.items(), key=lambda item: int(item[0]))]
+                for term, postings in sorted(terms.items())
+            }
+            write_json(path, shard)
+            written += 1
+        self.touched = set()
+        self.pages_changed = False
+        state = {
+            "version": SEARCH_VERSION,
+            "basepath": self.basepath,
+            "parser": parser_version(),
+            "next_id": self.next_id,
+            "pages": self.pages,
+            "shards": self.shards,
+        }
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        write_json(self.state_path, state)
+        return written
+
+
+def write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+    replace_if_changed(tmp_path, path)
@@ -0,0 +1,284 @@
+import argparse
+import asyncio
+import email.utils
+import mimetypes
+import os
+import re
+from http import HTTPStatus
+from urllib.parse import unquote, urlsplit
+
+SMALL_FILE_LIMIT = 64 * 1024
+KEEP_ALIVE_TIMEOUT = 15
+MAX_HEADER_BYTES = 64 * 1024
+# preferred first; siblings written by the --compress build stage
+ENCODINGS = (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz"))
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{8}\.[^./]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class Representation:
+    # one file that can answer a request: the page itself or a precompressed
+    # sibling. Small files keep their bytes in memory.
+    __slots__ = ("path", "size", "etag", "body")
+
+    def __init__(self, path, st, small_limit):
+        self.path = path
+        self.size = st.st_size
+        self.etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        self.body = None
+        if st.st_size <= small_limit:
+            with open(path, "rb") as f:
+                self.body = f.read()
+
+
+class FileEntry:
+    __slots__ = ("stamp", "plain", "variants", "content_type", "last_modified", "mtime", "cache_control")
+
+    def __init__(self, path, stamp, stats, small_limit):
+        st = stats[0]
+        self.stamp = stamp
+        self.plain = Representation(path, st, small_limit)
+        self.variants = {}
+        for (encoding, suffix), sibling_st in zip(ENCODINGS, stats[1:]):
+            # a sibling older than the file was made from different contents
+            if sibling_st is not None and sibling_st.st_mtime_ns >= st.st_mtime_ns:
+                self.variants[encoding] = Representation(path + suffix, sibling_st, small_limit)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        self.content_type = content_type
+        self.mtime = int(st.st_mtime)
+        self.last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+        self.cache_control = IMMUTABLE if FINGERPRINTED.search(path) else "no-cache"
+
+
+class FileIndex:
+    # in-memory index of the served tree. Entries are revalidated with a stat
+    # of the file and its siblings on every request, so a rebuild shows up
+    # without restarting the server.
+    def __init__(self, root, small_limit=SMALL_FILE_LIMIT):
+        self.root = os.path.abspath(root)
+        self.small_limit = small_limit
+        self.entries = {}
+
+    def resolve(self, url_path):
+        # (file path, None), (None, redirect location) or (None, None)
+        url_path = unquote(url_path)
+        if "\0" in url_path:
+            return None, None
+        path = os.path.normpath(os.path.join(self.root, url_path.lstrip("/")))
+        if path != self.root and not path.startswith(self.root + os.sep):
+            return None, None
+        if os.path.isdir(path):
+            if not url_path.endswith("/"):
+                return None, url_path + "/"
+            path = os.path.join(path, "index.html")
+        return path, None
+
+    def lookup(self, path):
+        stats = [stat_or_none(path)]
+        if stats[0] is None or not os.path.isfile(path):
+            self.entries.pop(path, None)
+            return None
+        stats.extend(stat_or_none(path + suffix) for encoding, suffix in ENCODINGS)
+        stamp = tuple(None if st is None else (st.st_size, st.st_mtime_ns) for st in stats)
+        entry = self.entries.get(path)
+        if entry is None or entry.stamp != stamp:
+            entry = FileEntry(path, stamp, stats, self.small_limit)
+            self.entries[path] = entry
+        return entry
+
+
+class StaticServer:
+    def __init__(self, root, small_limit=SMALL_FILE_LIMIT):
+        self.index = FileIndex(root, small_limit)
+
+    async def start(self, host=None, port=8888):
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES, backlog=4096)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except asyncio.LimitOverrunError:
+                    await self.send_status(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, False)
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+                request = parse_request(head)
+                if request is None:
+                    await self.send_status(writer, HTTPStatus.BAD_REQUEST, False)
+                    break
+                method, target, version, headers = request
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.1":
+                    keep_alive = connection != "close"
+                else:
+                    keep_alive = connection == "keep-alive"
+                if method not in ("GET", "HEAD"):
+                    # the request body is never read, so the connection can't be reused
+                    await self.send_status(writer, HTTPStatus.METHOD_NOT_ALLOWED, False, {"Allow": "GET, HEAD"})
+                    break
+                await self.respond(writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except OSError:
+            # includes a file that broke off mid-response; the client can
+            # only be told by closing the connection
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, method, target, headers, keep_alive):
+        path, location = self.index.resolve(urlsplit(target).path)
+        if location is not None:
+            await self.send_status(writer, HTTPStatus.MOVED_PERMANENTLY, keep_alive, {"Location": location})
+            return
+        try:
+            entry = None if path is None else self.index.lookup(path)
+        except FileNotFoundError:
+            # removed between the stat and the read, e.g. by a rebuild
+            entry = None
+        except OSError:
+            await self.send_status(writer, HTTPStatus.INTERNAL_SERVER_ERROR, keep_alive)
+            return
+        if entry is None:
+            await self.send_status(writer, HTTPStatus.NOT_FOUND, keep_alive)
+            return
+        encoding = choose_encoding(headers.get("accept-encoding", ""), entry.variants)
+        representation = entry.plain if encoding is None else entry.variants[encoding]
+        response_headers = {
+            "ETag": representation.etag,
+            "Last-Modified": entry.last_modified,
+            "Cache-Control": entry.cache_control,
+        }
+        if entry.variants:
+            response_headers["Vary"] = "Accept-Encoding"
+        if not_modified(headers, representation.etag, entry.mtime):
+            writer.write(response_head(HTTPStatus.NOT_MODIFIED, keep_alive, response_headers))
+            await writer.drain()
+            return
+        response_headers["Content-Type"] = entry.content_type
+        response_headers["Content-Length"] = str(representation.size)
+        if encoding is not None:
+            response_headers["Content-Encoding"] = encoding
+        if method == "HEAD" or representation.body is not None:
+            writer.write(response_head(HTTPStatus.OK, keep_alive, response_headers))
+            if method == "GET":
+                writer.write(representation.body)
+            await writer.drain()
+            return
+        # opened before anything is sent, so a vanished or unreadable file
+        # can still get a proper status
+        try:
+            f = open(representation.path, "rb")
+        except FileNotFoundError:
+            await self.send_status(writer, HTTPStatus.NOT_FOUND, keep_alive)
+            return
+        except OSError:
+            await self.send_status(writer, HTTPStatus.INTERNAL_SERVER_ERROR, keep_alive)
+            return
+        with f:
+            writer.write(response_head(HTTPStatus.OK, keep_alive, response_headers))
+            await writer.drain()
+            await asyncio.get_running_loop().sendfile(writer.transport, f, count=representation.size)
+
+    async def send_status(self, writer, status, keep_alive, headers=None):
+        body = f"{status.value} {status.phrase}\n".encode()
+        headers = dict(headers or {}, **{"Content-Type": "text/plain; charset=utf-8", "Content-Length": str(len(body))})
+        writer.write(response_head(status, keep_alive, headers) + body)
+        await writer.drain()
+
+
+def stat_or_none(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def parse_request(head):
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        return None
+    if not version.startswith("HTTP/1."):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            return None
+        headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+def choose_encoding(accept_encoding, variants):
+    if not variants:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and encoding in variants:
+            return encoding
+    return None
+
+
+def not_modified(headers, etag, mtime):
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None:
+        return False
+    try:
+        since = email.utils.parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return since is not None and mtime <= since.timestamp()
+
+
+def response_head(status, keep_alive, headers):
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}", f"Date: {email.utils.formatdate(usegmt=True)}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def serve(root, host, port):
+    server = await StaticServer(root).start(host, port)
+    addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+    print(f"Serving {root} on {addresses}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the generated site.")
+    parser.add_argument("directory", nargs="?", default="docs")
+    parser.add_argument("--port", "-p", type=int, default=8888)
+    parser.add_argument("--bind", "-b", default=None, help="address to listen on (default: all interfaces)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.directory, args.bind, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import json
+import os
+import time
+from xml.sax.saxutils import escape
+from copy_contents import replace_if_changed
+from manifest import CACHE_DIR, parser_version
+from search import page_url, write_json
+
+SITEMAP_STATE_PATH = os.path.join(CACHE_DIR, "sitemap")
+SITEMAP_VERSION = 2
+FEED_SECTION = "blog/"
+FEED_ENTRIES = 20
+ATTR_ENTITIES = {'"': "&quot;"}
+
+
+def w3c_date(timestamp):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timestamp))
+
+
+class SiteMap:
+    # docs/sitemap.xml for every page and docs/feed.xml, an Atom feed of the
+    # pages under content/blog/, newest first. Both are written from a store
+    # of page metadata (URL, title, source modification time) kept in
+    # .build-cache, so a build only updates the entries of the pages it
+    # rebuilt and rewrites the files only when an entry changed.
+    def __init__(self, dest_dir, site_url, basepath="/", state_path=SITEMAP_STATE_PATH):
+        self.dest_dir = dest_dir
+        self.site_url = site_url.rstrip("/")
+        self.basepath = basepath
+        self.state_path = state_path
+        self.pages = {}
+        self.changed = True
+        try:
+            with open(state_path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == SITEMAP_VERSION and data.get("site_url") == self.site_url and data.get("basepath") == basepath and data.get("parser") == parser_version():
+            self.pages = data["pages"]
+            self.changed = False
+
+    def has(self, source_path, source_hash):
+        # whether the entry comes from this version of the source; a build
+        # without the sitemap can have rebuilt the page since
+        page = self.pages.get(source_path)
+        return page is not None and page["source"] == source_hash
+
+    def update(self, source_path, dest_path, document, source_hash=None):
+        page = {
+            "url": page_url(dest_path, self.dest_dir, self.basepath),
+            "title": document.title,
+            "mtime": int(os.stat(source_path).st_mtime),
+            "source": source_hash,
+        }
+        if self.pages.get(source_path) != page:
+            self.pages[source_path] = page
+            self.changed = True
+
+    def remove(self, source_path):
+        if self.pages.pop(source_path, None) is not None:
+            self.changed = True
+
+    def prune(self, source_paths):
+        for source_path in [path for path in self.pages if path not in source_paths]:
+            self.remove(source_path)
+
+    def write(self):
+        # returns how many files were written
+        sitemap_path = os.path.join(self.dest_dir, "sitemap.xml")
+        feed_path = os.path.join(self.dest_dir, "feed.xml")
+        if not self.changed and os.path.exists(sitemap_path) and os.path.exists(feed_path):
+            return 0
+        pages = sorted(self.pages.values(), key=lambda page: page["url"])
+        write_text(sitemap_path, self.sitemap(pages))
+        write_text(feed_path, self.feed(pages))
+        self.changed = False
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        write_json(self.state_path, {
+            "version": SITEMAP_VERSION,
+            "site_url": self.site_url,
+            "basepath": self.basepath,
+            "parser": parser_version(),
+            "pages": self.pages,
+        })
+        return 2
+
+    def sitemap(self, pages):
+        parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+        for page in pages:
+            parts.append(f"<url><loc>{escape(self.site_url + page['url'])}</loc><lastmod>{w3c_date(page['mtime'])}</lastmod></url>\n")
+        parts.append("</urlset>\n")
+        return "".join(parts)
+
+    def feed(self, pages):
+        section = self.basepath + FEED_SECTION
+        posts = [page for page in pages if page["url"].startswith(section) and page["url"] != section]
+        posts.sort(key=lambda page: page["mtime"], reverse=True)
+        posts = posts[:FEED_ENTRIES]
+        home = next((page for page in pages if page["url"] == self.basepath), None)
+        title = home["title"] if home else self.site_url
+        feed_url = f"{self.site_url}{self.basepath}feed.xml"
+        updated = w3c_date(posts[0]["mtime"] if posts else 0)
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n',
+            f"<title>{escape(title)}</title>\n",
+            f'<link href="{escape(self.site_url + section, ATTR_ENTITIES)}"/>\n',
+            f'<link rel="self" href="{escape(feed_url, ATTR_ENTITIES)}"/>\n',
+            f"<id>{escape(feed_url)}</id>\n",
+            f"<updated>{updated}</updated>\n",
+            f"<author><name>{escape(title)}</name></author>\n",
+        ]
+        for page in posts:
+            url = escape(self.site_url + page["url"], ATTR_ENTITIES)
+            parts.append(
+                f'<entry><title>{escape(page["title"])}</title><link href="{url}"/>'
+                f"<id>{url}</id><updated>{w3c_date(page['mtime'])}</updated></entry>\n"
+            )
+        parts.append("</feed>\n")
+        return "".join(parts)
+
+
+def write_text(path, text):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    replace_if_changed(tmp_path, path)
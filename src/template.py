@@ -0,0 +1,88 @@
+import re
+from images import add_image_attributes
+from minify import minify_chunks
+
+TITLE_SLOT = "{{ Title }}"
+CONTENT_SLOT = "{{ Content }}"
+SLOT_PATTERN = re.compile(r"(\{\{ Title \}\}|\{\{ Content \}\})")
+ASSET_REF = re.compile(r'(href|src)="(/[^"]*)"')
+
+
+def rewrite_basepath(text, basepath):
+    if basepath == "/":
+        return text
+    text = text.replace('href="/', f'href="{basepath}')
+    return text.replace('src="/', f'src="{basepath}')
+
+
+def rewrite_assets(text, assets):
+    # site-absolute references to fingerprinted static files get the hashed name
+    if not assets:
+        return text
+    return ASSET_REF.sub(lambda m: f'{m.group(1)}="{assets.get(m.group(2), m.group(2))}"', text)
+
+
+def template_references(template_path):
+    # the site-absolute URLs a template links to itself
+    with open(template_path, "r") as f:
+        return sorted({match.group(2) for match in ASSET_REF.finditer(f.read())})
+
+
+class Template:
+    # a template split once into literal chunks and slot names; the literals
+    # already carry the image, asset and basepath rewrites, slot values get
+    # them when filled. images maps image URLs to their (width, height);
+    # with minify the rendered page is minified as it streams out. styles
+    # (a css.Stylesheets) inlines the template's small stylesheets.
+    def __init__(self, text, basepath="/", assets=None, images=None, minify=False, styles=None):
+        self.basepath = basepath
+        self.assets = assets or {}
+        self.images = images
+        self.minify = minify
+        if styles is not None:
+            text = styles.apply(text, basepath, self.assets)
+        self.parts = []
+        for i, part in enumerate(SLOT_PATTERN.split(text)):
+            if i % 2:
+                self.parts.append((True, part))
+            elif part:
+                self.parts.append((False, self.rewrite(part)))
+
+    @classmethod
+    def load(cls, template_path, basepath="/", assets=None, images=None, minify=False, styles=None):
+        with open(template_path, "r") as f:
+            return cls(f.read(), basepath, assets, images, minify, styles)
+
+    def rewrite(self, text):
+        # image sizes are looked up by the URL as written in the source
+        if self.images is not None:
+            text = add_image_attributes(text, self.images)
+        return rewrite_basepath(rewrite_assets(text, self.assets), self.basepath)
+
+    def render(self, title, content):
+        return "".join(self.iter_render(title, [content]))
+
+    def iter_render(self, title, content_chunks, rewritten=False):
+        # content_chunks is consumed lazily, so a page can be streamed to disk
+        # straight from the node tree. rewritten content chunks have already
+        # been through rewrite().
+        chunks = self.iter_parts(title, content_chunks, rewritten)
+        return minify_chunks(chunks) if self.minify else chunks
+
+    def iter_parts(self, title, content_chunks, rewritten=False):
+        title = self.rewrite(title)
+        if self.parts.count((True, CONTENT_SLOT)) > 1:
+            content_chunks = list(content_chunks)
+        for is_slot, text in self.parts:
+            if not is_slot:
+                yield text
+            elif text == TITLE_SLOT:
+                yield title
+            elif rewritten or (self.basepath == "/" and not self.assets and self.images is None):
+                yield from content_chunks
+            else:
+                for chunk in content_chunks:
+                    yield self.rewrite(chunk)
+
+    def __repr__(self):
+        return f"Template({self.parts}, {self.basepath})"
@@ -1,6 +1,7 @@
 import unittest
+import io
 from conversion_functions import markdown_to_blocks
-from blocknodes import BlockType, block_to_block_type, markdown_to_html_node
+from blocknodes import BlockType, block_to_block_type, markdown_to_html_node, parse_document, extract_title
 
 class TestMarkdownToBlocks(unittest.TestCase):
     def test_markdown_to_blocks(self):
@@ -270,5 +271,76 @@ the **same** even with inline stuff
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+class TestLineScanner(unittest.TestCase):
+    def html(self, md):
+        return markdown_to_html_node(md).to_html()
+
+    def test_nested_unordered_list(self):
+        md = "- one\n  - one a\n  - one b\n    - deeper\n- two"
+        self.assertEqual(
+            self.html(md),
+            "<div><ul><li>one<ul><li>one a</li><li>one b<ul><li>deeper</li></ul></li></ul></li><li>two</li></ul></div>",
+        )
+
+    def test_nested_ordered_list(self):
+        md = "1. first\n   3. sub three\n   4. sub four\n2. second"
+        self.assertEqual(
+            self.html(md),
+            '<div><ol><li>first<ol start="3"><li>sub three</li><li>sub four</li></ol></li><li>second</li></ol></div>',
+        )
+
+    def test_multi_paragraph_item(self):
+        md = "- first para\n\n  second para\n- next\n\nAfter the list"
+        self.assertEqual(
+            self.html(md),
+            "<div><ul><li><p>first para</p><p>second para</p></li><li>next</li></ul><p>After the list</p></div>",
+        )
+
+    def test_continuation_line(self):
+        self.assertEqual(self.html("- a long\n  item"), "<div><ul><li>a long item</li></ul></div>")
+
+    def test_separate_lists_stay_separate(self):
+        self.assertEqual(self.html("- a\n\n- b"), "<div><ul><li>a</li></ul><ul><li>b</li></ul></div>")
+
+    def test_fenced_code_with_blank_lines(self):
+        md = "```\nfirst\n\nsecond\n```\n\nText"
+        self.assertEqual(self.html(md), "<div><pre><code>first\n\nsecond\n</code></pre><p>Text</p></div>")
+
+    def test_unclosed_fence_falls_back_to_blocks(self):
+        self.assertEqual(self.html("```\ncode\n\n**text**"), "<div><p>` code</p><p><b>text</b></p></div>")
+
+    def test_nested_list_block_type(self):
+        self.assertEqual(block_to_block_type("- a\n  - b\n- c"), BlockType.UNORDERED_LIST)
+        self.assertEqual(block_to_block_type("1. a\n  - b\n2. c"), BlockType.ORDERED_LIST)
+
+
+class TestParseDocument(unittest.TestCase):
+    def test_parse_document_from_file(self):
+        md = "# Title\n\nSome **bold** text\n\n- one\n- two\n"
+        self.assertEqual(
+            parse_document(io.StringIO(md)).html_node.to_html(),
+            parse_document(md).html_node.to_html(),
+        )
+
+    def test_title_and_headings(self):
+        md = "## Intro\n\n# Tolkien Fan Club \n\nSome text\n\n### Blog posts"
+        document = parse_document(md)
+        self.assertEqual(document.title, "Tolkien Fan Club")
+        self.assertEqual(document.headings, [(2, "Intro"), (1, "Tolkien Fan Club"), (3, "Blog posts")])
+        self.assertEqual(document.html_node.to_html(), markdown_to_html_node(md).to_html())
+
+    def test_no_title(self):
+        document = parse_document("Just a paragraph")
+        self.assertIsNone(document.title)
+        with self.assertRaises(Exception):
+            extract_title("Just a paragraph")
+
+    def test_extract_title(self):
+        self.assertEqual(extract_title("text\n\n# Hello\n\n# Second"), "Hello")
+
+    def test_title_with_nested_emphasis(self):
+        self.assertEqual(parse_document("# **_Hello_ world**").title, "Hello world")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
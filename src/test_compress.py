@@ -0,0 +1,71 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import Compressor, gzip_bytes
+from test_support import write_file
+
+TEXT = "<p>" + "the same words over and over " * 50 + "</p>"
+
+class TestCompressor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.state = os.path.join(self.tmp.name, ".build-cache", "compressed")
+        self.page = self.write("index.html", TEXT)
+        self.write("images/tom.png", TEXT)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text):
+        return write_file(os.path.join(self.docs, rel_path), text)
+
+    def compress(self):
+        compressor = Compressor([("gzip", ".gz", gzip_bytes)], state_path=self.state)
+        compressor.sweep(self.docs)
+        try:
+            return compressor.finish()
+        finally:
+            compressor.close()
+
+    def test_writes_gzip_siblings_for_text_files(self):
+        self.assertEqual(self.compress(), 1)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), TEXT)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images", "tom.png.gz")))
+
+    def test_unchanged_files_are_not_recompressed(self):
+        self.compress()
+        self.assertEqual(self.compress(), 0)
+        self.write("index.html", TEXT)
+        self.assertEqual(self.compress(), 0)
+
+    def test_changed_file_is_recompressed(self):
+        self.compress()
+        self.write("index.html", TEXT + "<p>more</p>")
+        self.assertEqual(self.compress(), 1)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), TEXT + "<p>more</p>")
+
+    def test_missing_sibling_is_recreated(self):
+        self.compress()
+        os.remove(self.page + ".gz")
+        self.assertEqual(self.compress(), 1)
+        self.assertTrue(os.path.exists(self.page + ".gz"))
+
+    def test_sibling_of_removed_file_is_removed(self):
+        self.compress()
+        os.remove(self.page)
+        self.compress()
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+    def test_incompressible_file_gets_no_sibling(self):
+        small = self.write("tiny.css", "a{}")
+        self.compress()
+        self.assertFalse(os.path.exists(small + ".gz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+import contextlib
+import io
+
+from copy_contents import collect_pages, copy_files, generate_page, generate_pages_recursive, stream_page, write_chunks
+from template import Template
+from test_support import SiteTestCase, write_file
+
+class TestCopyFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.docs = os.path.join(self.tmp.name, "docs")
+        self.state = os.path.join(self.tmp.name, ".build-cache", "static")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write(self.static, "index.css", "body {}")
+        self.write(self.static, "images/tom.png", "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, root, rel_path, text):
+        return write_file(os.path.join(root, rel_path), text)
+
+    def sync(self, link="copy"):
+        return copy_files(self.static, self.docs, link, self.state)
+
+    def test_initial_sync_copies_everything(self):
+        self.assertEqual(self.sync(), (2, 0))
+        with open(os.path.join(self.docs, "images", "tom.png")) as f:
+            self.assertEqual(f.read(), "png")
+
+    def test_second_sync_copies_nothing(self):
+        self.sync()
+        self.assertEqual(self.sync(), (0, 0))
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        self.write(self.static, "index.css", "body { margin: 0 }")
+        self.assertEqual(self.sync(), (1, 0))
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertEqual(f.read(), "body { margin: 0 }")
+
+    def test_touched_but_identical_file_is_not_copied(self):
+        self.sync()
+        path = os.path.join(self.static, "index.css")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(self.sync(), (0, 0))
+        self.assertEqual(os.stat(os.path.join(self.docs, "index.css")).st_mtime_ns, 0)
+
+    def test_orphans_removed_generated_pages_kept(self):
+        self.sync()
+        page = self.write(self.docs, "blog/index.html", "<html></html>")
+        os.remove(os.path.join(self.static, "images", "tom.png"))
+        self.assertEqual(self.sync(), (0, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+        self.assertTrue(os.path.exists(page))
+
+    def test_hardlink_shares_inode(self):
+        self.sync("hardlink")
+        src = os.stat(os.path.join(self.static, "index.css"))
+        dst = os.stat(os.path.join(self.docs, "index.css"))
+        self.assertEqual(src.st_ino, dst.st_ino)
+
+    def test_resync_over_hardlink_does_not_write_through(self):
+        self.sync("hardlink")
+        os.remove(os.path.join(self.static, "index.css"))
+        self.write(self.static, "index.css", "body { margin: 0 }")
+        linked = os.path.join(self.static, "images", "tom.png")
+        self.sync("copy")
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertEqual(f.read(), "body { margin: 0 }")
+        with open(linked) as f:
+            self.assertEqual(f.read(), "png")
+
+    def test_reflink_falls_back_to_copy(self):
+        self.assertEqual(self.sync("reflink"), (2, 0))
+        with open(os.path.join(self.docs, "index.css")) as f:
+            self.assertEqual(f.read(), "body {}")
+
+    def test_invalid_link_mode(self):
+        with self.assertRaises(ValueError):
+            self.sync("symlink")
+
+    def test_fingerprinted_names(self):
+        assets = {}
+        copy_files(self.static, self.docs, "copy", self.state, assets)
+        self.assertEqual(sorted(assets), ["/images/tom.png", "/index.css"])
+        hashed = assets["/index.css"]
+        self.assertRegex(hashed, r"^/index\.[0-9a-f]{8}\.css$")
+        self.assertTrue(os.path.exists(os.path.join(self.docs, hashed[1:])))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "index.css")))
+
+    def test_changed_fingerprinted_file_replaces_old_name(self):
+        assets = {}
+        copy_files(self.static, self.docs, "copy", self.state, assets)
+        old = assets["/index.css"]
+        self.write(self.static, "index.css", "body { margin: 0 }")
+        assets = {}
+        self.assertEqual(copy_files(self.static, self.docs, "copy", self.state, assets), (1, 1))
+        self.assertNotEqual(assets["/index.css"], old)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, old[1:])))
+
+    def test_unchanged_files_not_rehashed(self):
+        assets = {}
+        copy_files(self.static, self.docs, "copy", self.state, assets)
+        with mock.patch("copy_contents.hash_file", side_effect=AssertionError("rehashed")):
+            again = {}
+            self.assertEqual(copy_files(self.static, self.docs, "copy", self.state, again), (0, 0))
+        self.assertEqual(again, assets)
+
+    def test_only_referenced_types_fingerprinted(self):
+        for name in (".nojekyll", "CNAME", "robots.txt", "favicon.ico"):
+            self.write(self.static, name, "x")
+        assets = {}
+        copy_files(self.static, self.docs, "copy", self.state, assets)
+        self.assertEqual(sorted(assets), ["/images/tom.png", "/index.css"])
+        for name in (".nojekyll", "CNAME", "robots.txt", "favicon.ico"):
+            self.assertTrue(os.path.exists(os.path.join(self.docs, name)))
+
+    def test_stylesheet_urls_follow_hashed_names(self):
+        self.write(self.static, "css/site.css", "a { background: url('../images/tom.png?v=1') } b { background: url(/images/tom.png) }")
+        assets = {}
+        copy_files(self.static, self.docs, "copy", self.state, assets)
+        image = assets["/images/tom.png"]
+        with open(os.path.join(self.docs, assets["/css/site.css"][1:])) as f:
+            self.assertEqual(f.read(), f"a {{ background: url('..{image}?v=1') }} b {{ background: url({image}) }}")
+        old_css = assets["/css/site.css"]
+        self.write(self.static, "images/tom.png", "new png")
+        assets = {}
+        copy_files(self.static, self.docs, "copy", self.state, assets)
+        self.assertNotEqual(assets["/css/site.css"], old_css)
+
+
+class TestGeneratePages(SiteTestCase):
+    template_text = '<title>{{ Title }}</title><link href="/index.css">{{ Content }}'
+
+    def setUp(self):
+        super().setUp()
+        for i in range(6):
+            self.write(f"content/post{i}/index.md", f"# Post {i}\n\nSome **bold** text and a [link](/post{i})")
+        self.write("content/broken.md", "no heading here")
+
+    def build_into(self, dest, jobs):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            generate_pages_recursive(self.content, self.template, dest, "/base/", jobs=jobs)
+        pages = {}
+        for source, dest_path in collect_pages(self.content, dest):
+            if os.path.exists(dest_path):
+                with open(dest_path, "rb") as f:
+                    pages[os.path.relpath(dest_path, dest)] = f.read()
+        return pages, out.getvalue()
+
+    def test_parallel_output_matches_serial(self):
+        serial, _ = self.build_into(os.path.join(self.root, "serial"), 1)
+        parallel, _ = self.build_into(os.path.join(self.root, "parallel"), 3)
+        self.assertEqual(len(serial), 6)
+        self.assertEqual(serial, parallel)
+
+    def test_parallel_errors_reported_per_page(self):
+        _, log = self.build_into(os.path.join(self.root, "parallel"), 3)
+        self.assertIn("broken.md: No level 1 heading found", log)
+        self.assertEqual(log.count("Generated: "), 6)
+
+
+class TestWriteChunks(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs", "index.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_identical_output_not_rewritten(self):
+        self.assertTrue(write_chunks(["<p>", "hi</p>"], self.dest))
+        os.utime(self.dest, ns=(10**9, 10**9))
+        self.assertFalse(write_chunks(["<p>hi", "</p>"], self.dest))
+        self.assertEqual(os.stat(self.dest).st_mtime_ns, 10**9)
+        self.assertFalse(os.path.exists(self.dest + ".tmp"))
+
+    def test_changed_output_replaced(self):
+        write_chunks(["<p>hi</p>"], self.dest)
+        self.assertTrue(write_chunks(["<p>ho</p>"], self.dest))
+        with open(self.dest) as f:
+            self.assertEqual(f.read(), "<p>ho</p>")
+
+
+class TestStreamPage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "big.md")
+        self.template = Template('<title>{{ Title }}</title><a href="/">home</a>{{ Content }}', "/base/")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def render_both(self, md):
+        with open(self.source, "w") as f:
+            f.write(md)
+        streamed = os.path.join(self.tmp.name, "streamed.html")
+        whole = os.path.join(self.tmp.name, "whole.html")
+        stream_page(self.source, self.template, streamed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page(self.source, self.template, whole, "/base/")
+        with open(streamed) as f1, open(whole) as f2:
+            return f1.read(), f2.read()
+
+    def test_stream_matches_whole_file_render(self):
+        md = "Intro with [a link](/x)\n\n# Title\n\n" + "\n\n".join(f"Paragraph **{i}**\n\n- item {i}" for i in range(200))
+        streamed, whole = self.render_both(md)
+        self.assertEqual(streamed, whole)
+
+    def test_stream_without_title(self):
+        with open(self.source, "w") as f:
+            f.write("no title\n\nat all")
+        with self.assertRaises(Exception):
+            stream_page(self.source, self.template, os.path.join(self.tmp.name, "out.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "out.html")))
+
+    def test_long_preamble_spooled(self):
+        # the spool is read back in 64 KiB slices; one ends inside <a href="/t2563">
+        md = "\n\n".join(f"Preamble {i} [link](/t{i}) ![img](/i{i}.png)" for i in range(3000)) + "\n\n# Title\n\nBody"
+        with mock.patch("copy_contents.STREAM_SPOOL_SIZE", 1024):
+            streamed, whole = self.render_both(md)
+        self.assertEqual(streamed, whole)
+        self.assertNotIn('="/t', streamed)
+
+    def test_page_without_title_fails_in_bounded_memory(self):
+        with open(self.source, "w") as f:
+            f.write("\n\n".join(f"Paragraph **{i}** of many" for i in range(20000)))
+        tracemalloc.start()
+        try:
+            with self.assertRaises(Exception), mock.patch("copy_contents.STREAM_SPOOL_SIZE", 1024):
+                stream_page(self.source, self.template, os.path.join(self.tmp.name, "out.html"))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, os.path.getsize(self.source))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from css import Stylesheets, minify_css, rewrite_css_urls
+from template import Template
+from test_support import write_file
+
+TEMPLATE = '<head><link href="/index.css" rel="stylesheet" /><link href="/big.css" rel="stylesheet"></head>{{ Content }}'
+
+class TestStylesheets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = self.tmp.name
+        self.write("index.css", "/* site */\nbody {\n  margin: 0;\n  background: url(images/bg.png);\n}\n")
+        self.write("big.css", "p { color: red }\n" * 100)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        write_file(os.path.join(self.static, name), text)
+
+    def test_small_inlined_large_preloaded(self):
+        template = Template(TEMPLATE, "/blog/", styles=Stylesheets(self.static, threshold=200))
+        self.assertEqual(
+            template.render("t", ""),
+            "<head><style>body{margin:0;background:url(/blog/images/bg.png)}</style>"
+            '<link rel="preload" href="/blog/big.css" as="style"><link href="/blog/big.css" rel="stylesheet"></head>',
+        )
+
+    def test_processed_once_per_build(self):
+        styles = Stylesheets(self.static, threshold=200)
+        Template(TEMPLATE, "/", styles=styles)
+        self.write("index.css", "body { margin: 1px }")
+        self.assertIn("margin:0", Template(TEMPLATE, "/", styles=styles).render("t", ""))
+        styles.reset()
+        self.assertIn("margin:1px", Template(TEMPLATE, "/", styles=styles).render("t", ""))
+
+    def test_fingerprint_follows_css_changes(self):
+        styles = Stylesheets(self.static)
+        before = styles.fingerprint()
+        self.write("index.css", "body{}")
+        self.assertNotEqual(styles.fingerprint(), before)
+
+    def test_minify_css_keeps_strings(self):
+        self.assertEqual(
+            minify_css('a::after { content: " ; { } " ; }  /* x */ b , i { color : red }'),
+            'a::after{content:" ; { } "}b,i{color :red}',
+        )
+
+    def test_rewrite_css_urls(self):
+        css = "a{background:url('../img/a.png')}b{background:url(/x.png)}i{background:url(data:image/png;base64,AA)}"
+        self.assertEqual(
+            rewrite_css_urls(css, "/css/site.css", "/", {"/img/a.png": "/img/a.0123abcd.png"}),
+            "a{background:url('/img/a.0123abcd.png')}b{background:url(/x.png)}i{background:url(data:image/png;base64,AA)}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+from deploy import DeployDelta
+from test_support import write_file
+
+class TestDeployDelta(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, "docs")
+        self.state = os.path.join(self.tmp.name, ".build-cache", "deploy")
+        self.write("index.html", "home")
+        self.write("blog/tom/index.html", "tom")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rel_path, text, mtime_ns=None):
+        write_file(os.path.join(self.dest, rel_path), text, mtime_ns)
+
+    def scan(self):
+        deploy = DeployDelta(self.dest, self.state)
+        delta = deploy.scan()
+        deploy.save()
+        return delta
+
+    def test_first_build_adds_everything(self):
+        self.assertEqual(self.scan(), {"added": ["index.html", "blog/tom/index.html"], "changed": [], "removed": []})
+
+    def test_only_differences_reported(self):
+        self.scan()
+        self.assertEqual(self.scan(), {"added": [], "changed": [], "removed": []})
+        self.write("index.html", "home", 10**9)
+        self.write("feed.xml", "<feed/>")
+        os.remove(os.path.join(self.dest, "blog", "tom", "index.html"))
+        self.write("blog/glorfindel/index.html", "glorfindel")
+        self.assertEqual(self.scan(), {"added": ["feed.xml", "blog/glorfindel/index.html"], "changed": [], "removed": ["blog/tom/index.html"]})
+
+    def test_changed_contents(self):
+        self.scan()
+        self.write("index.html", "away")
+        self.assertEqual(self.scan()["changed"], ["index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -133,6 +133,28 @@ class TestHTMLNode(unittest.TestCase):
         with self.assertRaises(ValueError):
             parent.to_html()
     
+    def test_nested_props_not_in_closing_tag(self):
+        inner = ParentNode("span", [LeafNode(None, "text")], {"class": "x"})
+        outer = ParentNode("div", [inner], {"id": "y"})
+        self.assertEqual(outer.to_html(), '<div id="y"><span class="x">text</span></div>')
+
+    def test_iter_html_chunks(self):
+        node = ParentNode("p", [LeafNode(None, "a "), LeafNode("b", "b"), ParentNode("i", [LeafNode(None, "c")])])
+        self.assertEqual(list(node.iter_html()), ["<p>", "a ", "<b>b</b>", "<i>", "c", "</i>", "</p>"])
+
+    def test_write_html(self):
+        import io
+        node = ParentNode("div", [ParentNode("p", [LeafNode(None, "x")])])
+        out = io.StringIO()
+        node.write_html(out)
+        self.assertEqual(out.getvalue(), node.to_html())
+
+    def test_deep_nesting(self):
+        node = LeafNode(None, "x")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        self.assertEqual(node.to_html(), "<span>" * 5000 + "x" + "</span>" * 5000)
+
     def test_complex_structure(self):
         """Test a more complex HTML structure"""
         # Create a form with multiple elements
@@ -668,6 +690,50 @@ class TestTextToTextNodes(unittest.TestCase):
         self.assertEqual(nodes[0].text, "")
         self.assertEqual(nodes[0].text_type, TextType.TEXT)
 
+    def test_images_keep_their_type(self):
+        nodes = text_to_textnodes("See ![Tom](/images/tom.png) and [the blog](/blog)")
+        self.assertListEqual(
+            [
+                TextNode("See ", TextType.TEXT),
+                TextNode("Tom", TextType.IMAGE, "/images/tom.png"),
+                TextNode(" and ", TextType.TEXT),
+                TextNode("the blog", TextType.LINK, "/blog"),
+            ],
+            nodes,
+        )
+
+    def test_nested_emphasis(self):
+        nodes = text_to_textnodes("This is **bold _and italic_ text** here")
+        self.assertListEqual(
+            [
+                TextNode("This is ", TextType.TEXT),
+                TextNode("bold and italic text", TextType.BOLD, children=[
+                    TextNode("bold ", TextType.TEXT),
+                    TextNode("and italic", TextType.ITALIC),
+                    TextNode(" text", TextType.TEXT),
+                ]),
+                TextNode(" here", TextType.TEXT),
+            ],
+            nodes,
+        )
+        html = ParentNode("p", [text_node_to_html_node(node) for node in nodes]).to_html()
+        self.assertEqual(html, "<p>This is <b>bold <i>and italic</i> text</b> here</p>")
+
+    def test_code_is_literal(self):
+        nodes = text_to_textnodes("Use `a_b **c**` here")
+        self.assertEqual(nodes[1], TextNode("a_b **c**", TextType.CODE))
+
+    def test_unclosed_delimiter_is_text(self):
+        nodes = text_to_textnodes("snake_case and **bold**")
+        self.assertListEqual(
+            [TextNode("snake_case and ", TextType.TEXT), TextNode("bold", TextType.BOLD)],
+            nodes,
+        )
+
+    def test_image_renders_as_void_element(self):
+        node = text_node_to_html_node(TextNode("Tom", TextType.IMAGE, "/images/tom.png"))
+        self.assertEqual(node.to_html(), '<img src="/images/tom.png" alt="Tom">')
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
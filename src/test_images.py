@@ -0,0 +1,84 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from images import ImageIndex, add_image_attributes, image_size
+from template import Template
+
+PNG = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 640, 480) + b"\x08\x06\x00\x00\x00"
+GIF = b"GIF89a" + struct.pack("<HH", 32, 16) + b"\x00" * 8
+JPEG = (
+    b"\xff\xd8"
+    + b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    + b"\xff\xe1" + struct.pack(">H", 1002) + b"\xff\xc0" * 500
+    + b"\xff\xc0" + struct.pack(">H", 17) + b"\x08" + struct.pack(">HH", 300, 400) + b"\x03" + b"\x00" * 9
+)
+WEBP_VP8X = b"RIFF" + struct.pack("<I", 30) + b"WEBPVP8X" + struct.pack("<I", 10) + b"\x00" * 4 + (1023).to_bytes(3, "little") + (767).to_bytes(3, "little")
+WEBP_VP8L = b"RIFF" + struct.pack("<I", 30) + b"WEBPVP8L" + struct.pack("<I", 10) + b"\x2f" + ((99) | (49 << 14)).to_bytes(4, "little") + b"\x00" * 8
+
+class TestImageSize(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def size_of(self, data, name="image"):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return image_size(path)
+
+    def test_formats(self):
+        self.assertEqual(self.size_of(PNG), (640, 480))
+        self.assertEqual(self.size_of(GIF), (32, 16))
+        self.assertEqual(self.size_of(JPEG), (400, 300))
+        self.assertEqual(self.size_of(WEBP_VP8X), (1024, 768))
+        self.assertEqual(self.size_of(WEBP_VP8L), (100, 50))
+
+    def test_unknown_or_truncated(self):
+        self.assertIsNone(self.size_of(b"not an image"))
+        self.assertIsNone(self.size_of(JPEG[:30]))
+
+    def test_index_reuses_unchanged_entries(self):
+        static = os.path.join(self.tmp.name, "static")
+        os.makedirs(os.path.join(static, "images"))
+        path = os.path.join(static, "images", "tom.png")
+        with open(path, "wb") as f:
+            f.write(PNG)
+        state = os.path.join(self.tmp.name, "images.json")
+        index = ImageIndex(static, state)
+        self.assertEqual(index.scan(), {"/images/tom.png": (640, 480)})
+        index.save()
+        index = ImageIndex(static, state)
+        index.entries[path][2] = [1, 1]
+        self.assertEqual(index.scan(), {"/images/tom.png": (1, 1)})
+        with open(path, "wb") as f:
+            f.write(GIF)
+        self.assertEqual(index.scan(), {"/images/tom.png": (32, 16)})
+
+
+class TestImageAttributes(unittest.TestCase):
+    def test_known_and_unknown_images(self):
+        html = '<p><img src="/images/tom.png" alt="Tom > Bombadil"><img src="https://x/y.png" alt=""></p>'
+        self.assertEqual(
+            add_image_attributes(html, {"/images/tom.png": (928, 468)}),
+            '<p><img src="/images/tom.png" alt="Tom > Bombadil" width="928" height="468" loading="lazy" decoding="async">'
+            '<img src="https://x/y.png" alt="" loading="lazy" decoding="async"></p>',
+        )
+
+    def test_existing_attributes_kept(self):
+        html = '<img src="/a.png" width="10" loading="eager">'
+        self.assertEqual(add_image_attributes(html, {"/a.png": (1, 2)}), '<img src="/a.png" width="10" loading="eager" decoding="async">')
+
+    def test_template_sizes_before_basepath(self):
+        template = Template("{{ Content }}", "/blog/", images={"/images/tom.png": (928, 468)})
+        self.assertEqual(
+            template.render("t", '<img src="/images/tom.png" alt="Tom">'),
+            '<img src="/blog/images/tom.png" alt="Tom" width="928" height="468" loading="lazy" decoding="async">',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import unittest
+
+from blocknodes import parse_document
+from links import LinkChecker, link_target
+from manifest import hash_file
+from parse_cache import ParseCache
+from test_support import SiteTestCase
+
+class TestCollectLinks(unittest.TestCase):
+    def test_links_and_images_collected(self):
+        document = parse_document("# [Tom](/blog/tom)\n\n![a](/a.png) and **[b](b.html)**\n\n- [c](#top)", collect_links=True)
+        self.assertEqual(document.links, ["/blog/tom", "/a.png", "b.html", "#top"])
+
+    def test_links_off_by_default(self):
+        self.assertIsNone(parse_document("# [Tom](/blog/tom)").links)
+
+    def test_link_target(self):
+        self.assertEqual(link_target("/blog/tom", "index.html"), "blog/tom")
+        self.assertEqual(link_target("/", "blog/tom/index.html"), "")
+        self.assertEqual(link_target("../glorfindel/#x", "blog/tom/index.html"), "blog/glorfindel")
+        self.assertEqual(link_target("a%20b.png?v=1", "index.html"), "a b.png")
+        for link in ("https://boot.dev", "//cdn.example.com/x.js", "mailto:me@example.com", "#top"):
+            self.assertIsNone(link_target(link, "index.html"))
+
+
+class TestLinkChecker(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state = os.path.join(self.cache_dir, "links")
+        self.write("content/index.md", "# Home\n\n[Tom](/blog/tom) [Goldberry](/blog/goldberry) ![me](/images/me.png)")
+        self.write("content/blog/tom/index.md", "# Tom\n\n[Home](/) [Glorfindel](../glorfindel/) [Bombadil](https://example.com)")
+        self.write("static/images/me.png", "")
+
+    def build(self, cache=None):
+        links = LinkChecker(self.dest, self.state)
+        manifest = super().build(cache=cache, links=links)
+        links.prune(manifest.seen)
+        links.save()
+        return self.rebuilt, links.check(self.static)
+
+    def test_broken_links_reported(self):
+        rebuilt, broken = self.build()
+        self.assertEqual(rebuilt, 2)
+        self.assertEqual(broken, [
+            (os.path.join(self.content, "blog", "tom", "index.md"), "../glorfindel/"),
+            (os.path.join(self.content, "index.md"), "/blog/goldberry"),
+        ])
+
+    def test_fresh_pages_checked_without_parsing(self):
+        self.build()
+        self.write("content/blog/goldberry/index.md", "# Goldberry")
+        rebuilt, broken = self.build()
+        self.assertEqual(rebuilt, 1)
+        self.assertEqual(broken, [(os.path.join(self.content, "blog", "tom", "index.md"), "../glorfindel/")])
+
+    def test_pages_rebuilt_without_checker_rechecked(self):
+        self.build()
+        self.write("content/index.md", "# Home\n\n[bad](/nowhere)")
+        super().build()
+        rebuilt, broken = self.build()
+        self.assertEqual(rebuilt, 1)
+        self.assertIn((os.path.join(self.content, "index.md"), "/nowhere"), broken)
+
+    def test_links_come_from_parse_cache(self):
+        cache = ParseCache(os.path.join(self.cache_dir, "pages"))
+        self.build(cache)
+        source_hash = hash_file(os.path.join(self.content, "index.md"))
+        cached = cache.load(source_hash)
+        cached.links = ["/nowhere"]
+        cache.store(source_hash, cached)
+        os.remove(self.state)
+        rebuilt, broken = self.build(cache)
+        self.assertEqual(rebuilt, 2)
+        self.assertIn((os.path.join(self.content, "index.md"), "/nowhere"), broken)
+
+
+if __name__ == "__main__":
+    unittest.main()
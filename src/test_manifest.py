@@ -0,0 +1,174 @@
+import contextlib
+import io
+import os
+import unittest
+
+from copy_contents import generate_pages_recursive, remove_outputs
+from manifest import RENDERER_MODULES, BuildManifest, build_inputs, reference_inputs, source_version
+from test_support import SiteTestCase
+
+class TestBuildManifest(SiteTestCase):
+    template_text = "<title>{{ Title }}</title><main>{{ Content }}</main>"
+
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home\n\nSee [blog](/blog)")
+        self.write("content/blog/index.md", "# Blog\n\nHello")
+
+    def mtimes(self):
+        index = os.path.join(self.dest, "index.html")
+        blog = os.path.join(self.dest, "blog", "index.html")
+        return os.stat(index).st_mtime_ns, os.stat(blog).st_mtime_ns
+
+    def test_noop_rebuild_skips_pages(self):
+        self.build()
+        before = self.mtimes()
+        self.build()
+        self.assertEqual(self.mtimes(), before)
+
+    def test_changed_source_is_rebuilt(self):
+        self.build()
+        index_before, blog_before = self.mtimes()
+        self.write("content/blog/index.md", "# Blog\n\nChanged")
+        self.build()
+        index_after, blog_after = self.mtimes()
+        self.assertEqual(index_after, index_before)
+        with open(os.path.join(self.dest, "blog", "index.html")) as f:
+            self.assertIn("Changed", f.read())
+
+    def test_basepath_change_rebuilds_everything(self):
+        self.build()
+        self.build("/blog/")
+        with open(os.path.join(self.dest, "index.html")) as f:
+            self.assertIn('href="/blog/blog"', f.read())
+
+    def test_missing_output_is_rebuilt(self):
+        self.build()
+        os.remove(os.path.join(self.dest, "index.html"))
+        self.build()
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+    def test_removed_source_is_dropped(self):
+        source = os.path.join(self.content, "blog", "index.md")
+        self.build()
+        os.remove(source)
+        self.build()
+        self.assertNotIn(source, BuildManifest.load(self.manifest_path).entries)
+
+    def test_outputs_of_removed_sources_returned_and_removed(self):
+        self.build()
+        dest = os.path.join(self.dest, "blog", "index.html")
+        self.write("docs/blog/index.html.gz", b"")
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        self.build()
+        self.assertEqual(self.orphans, [dest])
+        self.assertEqual(remove_outputs(self.dest, self.orphans), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+    def test_forced_build_keeps_entries_of_removed_sources(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        manifest = BuildManifest.load(self.manifest_path, force=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest), 1)
+        self.assertEqual(manifest.save(), [os.path.join(self.dest, "blog", "index.html")])
+
+    def test_unchanged_manifest_not_rewritten(self):
+        self.build()
+        os.utime(self.manifest_path, ns=(10**9, 10**9))
+        self.build()
+        self.assertEqual(os.stat(self.manifest_path).st_mtime_ns, 10**9)
+        self.write("content/index.md", "# Home\n\nChanged")
+        self.build()
+        self.assertNotEqual(os.stat(self.manifest_path).st_mtime_ns, 10**9)
+
+    def test_only_pages_referencing_a_static_file_rebuilt(self):
+        self.write("content/blog/index.md", "# Blog\n\n![Tom](/images/tom.png)")
+        images = {"/images/tom.png": (10, 20)}
+        assets = {"/images/tom.png": "/images/tom.0000aaaa.png"}
+        self.build(images=images, assets=assets)
+        images["/images/new.png"] = (1, 1)
+        assets["/images/new.png"] = "/images/new.1111bbbb.png"
+        self.build(images=images, assets=assets)
+        self.assertEqual(self.rebuilt, 0)
+        images["/images/tom.png"] = (30, 40)
+        self.build(images=images, assets=assets)
+        self.assertEqual(self.rebuilt, 1)
+        assets["/images/tom.png"] = "/images/tom.2222cccc.png"
+        manifest = self.build(images=images, assets=assets)
+        self.assertEqual(self.rebuilt, 1)
+        with open(os.path.join(self.dest, "blog", "index.html")) as f:
+            self.assertIn('<img src="/images/tom.2222cccc.png" alt="Tom" width="30" height="40"', f.read())
+        self.assertEqual(manifest.dependents("image:/images/tom.png"), [os.path.join(self.content, "blog", "index.md")])
+
+    def test_only_static_file_references_recorded(self):
+        assets = {"/index.css": "/index.0000aaaa.css", "/images/tom.png": "/images/tom.1111bbbb.png"}
+        images = {"/images/tom.png": (10, 20)}
+        urls = ["/blog/tom", "/index.css", "/images/tom.png?v=2", "/images/new.png", "https://example.com/a.png"]
+        self.assertEqual(reference_inputs(urls, assets, images), {
+            "asset:/index.css": "/index.0000aaaa.css",
+            "asset:/images/tom.png?v=2": None,
+            "image:/images/tom.png?v=2": None,
+            "asset:/images/new.png": None,
+            "image:/images/new.png": None,
+        })
+
+    def test_template_references_concern_every_page(self):
+        self.write("template.html", '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}')
+        assets = {"/index.css": "/index.0000aaaa.css"}
+        self.build(assets=assets)
+        assets["/images/new.png"] = "/images/new.1111bbbb.png"
+        self.build(assets=assets)
+        self.assertEqual(self.rebuilt, 0)
+        assets["/index.css"] = "/index.2222cccc.css"
+        self.build(assets=assets)
+        self.assertEqual(self.rebuilt, 2)
+
+    def test_inputs_depend_on_template(self):
+        inputs = build_inputs(self.template, "/")
+        with open(self.template, "a") as f:
+            f.write("<footer></footer>")
+        self.assertNotEqual(build_inputs(self.template, "/"), inputs)
+
+    def test_renderer_change_rebuilds_everything(self):
+        self.build()
+        manifest = BuildManifest.load(self.manifest_path)
+        for entry in manifest.entries.values():
+            entry["deps"]["renderer"] = "older"
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest), 2)
+        self.assertEqual(build_inputs(self.template, "/")["renderer"], source_version(RENDERER_MODULES))
+
+    def test_stale_reasons_name_changed_inputs(self):
+        self.build()
+        manifest = BuildManifest.load(self.manifest_path)
+        source = os.path.join(self.content, "index.md")
+        dest = os.path.join(self.dest, "index.html")
+        self.assertEqual(manifest.stale_reasons(source, dest, build_inputs(self.template, "/")), [])
+        with open(self.template, "a") as f:
+            f.write("<footer></footer>")
+        reasons = manifest.stale_reasons(source, dest, build_inputs(self.template, "/"))
+        self.assertEqual(reasons, [f"template:{self.template} changed"])
+        reasons = manifest.stale_reasons(os.path.join(self.content, "new.md"), dest, {})
+        self.assertEqual(reasons, ["new page"])
+
+    def test_dependents(self):
+        manifest = self.build()
+        pages = [os.path.join(self.content, "blog", "index.md"), os.path.join(self.content, "index.md")]
+        self.assertEqual(manifest.dependents("parser"), pages)
+        self.assertEqual(manifest.dependents("template:other.html"), [])
+
+    def test_explain_prints_reasons(self):
+        self.build()
+        with open(os.path.join(self.content, "index.md"), "a") as f:
+            f.write("\n\nMore")
+        manifest = BuildManifest.load(self.manifest_path)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            generate_pages_recursive(self.content, self.template, self.dest, "/", manifest, explain=True)
+        self.assertIn(f"Rebuilding {os.path.join(self.content, 'index.md')}: source changed", out.getvalue())
+        self.assertNotIn(os.path.join(self.content, "blog", "index.md"), out.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()
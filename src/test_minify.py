@@ -0,0 +1,61 @@
+import unittest
+
+from minify import minify_chunks, minify_html
+from template import Template
+
+PAGE = """<!doctype html>
+<html>
+  <head>
+    <meta charset="utf-8" />
+    <title>Tom</title>
+    <!-- styles -->
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <p>Some   <b>bold</b>
+       text, kept <a href="/tom" title="Tom > Bombadil">link</a> .</p>
+    <pre><code>keep   this
+  <b>exactly</b>
+</code></pre>
+    <p>a < b</p>
+  </body>
+</html>
+"""
+
+class TestMinify(unittest.TestCase):
+    def test_minifies_page(self):
+        self.assertEqual(
+            minify_html(PAGE),
+            '<!doctype html><html><head><meta charset=utf-8><title>Tom</title>'
+            '<link href=/index.css rel=stylesheet></head><body>'
+            '<p>Some <b>bold</b> text, kept <a href=/tom title="Tom > Bombadil">link</a> .</p>'
+            '<pre><code>keep   this\n  <b>exactly</b>\n</code></pre>'
+            '<p>a < b</p></body></html>',
+        )
+
+    def test_any_chunking_gives_same_output(self):
+        whole = minify_html(PAGE)
+        for size in (1, 2, 3, 7, 64):
+            chunks = [PAGE[i:i + size] for i in range(0, len(PAGE), size)]
+            self.assertEqual("".join(minify_chunks(chunks)), whole, size)
+
+    def test_quotes_kept_where_needed(self):
+        self.assertEqual(
+            minify_html('<a href="" class="a b" data-x="1=2" id="x">y</a>'),
+            '<a href="" class="a b" data-x="1=2" id=x>y</a>',
+        )
+
+    def test_unclosed_comment_and_tag_left_as_text(self):
+        self.assertEqual(minify_html("<p>x</p><!-- open"), "<p>x</p><!-- open")
+        self.assertEqual(minify_html("<p>x <b"), "<p>x <b")
+
+    def test_template_minify(self):
+        template = Template("<title>{{ Title }}</title>\n  <article>{{ Content }}</article>\n", "/blog/", minify=True)
+        self.assertEqual(
+            "".join(template.iter_render("Tom", iter(["<p>", '<a href="/tom">', "Tom", "</a>", "</p>"]))),
+            "<title>Tom</title><article><p><a href=/blog/tom>Tom</a></p></article>",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
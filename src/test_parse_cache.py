@@ -0,0 +1,62 @@
+import contextlib
+import io
+import os
+import unittest
+
+from blocknodes import parse_document
+from copy_contents import generate_page
+from manifest import hash_file
+from parse_cache import ParseCache
+from template import Template
+from test_support import SiteTestCase
+
+class TestParseCache(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ParseCache(os.path.join(self.cache_dir, "pages"), "v1")
+        self.source = self.write("content/index.md", "# Home\n\n## Intro\n\nSome **bold** [link](/blog)")
+
+    def generate(self, template, cache):
+        dest = os.path.join(self.dest, "index.html")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_page(self.source, template, dest, template.basepath, cache=cache)
+        with open(dest) as f:
+            return f.read()
+
+    def test_round_trip(self):
+        document = parse_document("# Home\n\n## Intro")
+        document.body = document.html_node.to_html()
+        self.cache.store("abc", document)
+        loaded = self.cache.load("abc")
+        self.assertEqual(loaded.title, "Home")
+        self.assertEqual(loaded.headings, [(1, "Home"), (2, "Intro")])
+        self.assertEqual(loaded.body, document.body)
+        self.assertIsNone(ParseCache(self.cache.path, "v2").load("abc"))
+
+    def test_cached_page_matches_uncached(self):
+        template = Template('<title>{{ Title }}</title>{{ Content }}', "/base/")
+        uncached = self.generate(template, None)
+        self.assertEqual(self.generate(template, self.cache), uncached)
+        self.assertIsNotNone(self.cache.load(hash_file(self.source)))
+        self.assertEqual(self.generate(template, self.cache), uncached)
+
+    def test_template_change_uses_cached_body(self):
+        self.generate(Template("{{ Content }}"), self.cache)
+        cached = self.cache.load(hash_file(self.source))
+        cached.body = "<div>from cache</div>"
+        self.cache.store(hash_file(self.source), cached)
+        self.assertEqual(self.generate(Template("<main>{{ Content }}</main>"), self.cache), "<main><div>from cache</div></main>")
+
+    def test_prune(self):
+        document = parse_document("# A")
+        document.body = "<div></div>"
+        self.cache.store("aa11", document)
+        self.cache.store("bb22", document)
+        self.assertEqual(self.cache.prune(["aa11"]), 1)
+        self.assertIsNotNone(self.cache.load("aa11"))
+        self.assertIsNone(self.cache.load("bb22"))
+        self.assertFalse(os.path.exists(os.path.join(self.cache.path, "bb")))
+
+
+if __name__ == "__main__":
+    unittest.main()
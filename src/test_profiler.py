@@ -0,0 +1,50 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from copy_contents import generate_pages_recursive
+from profiler import STAGES, BuildProfiler
+
+class TestBuildProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        with open(self.template, "w") as f:
+            f.write("<title>{{ Title }}</title>{{ Content }}")
+        for name in ("a", "b", "c"):
+            os.makedirs(os.path.join(self.content, name))
+            with open(os.path.join(self.content, name, "index.md"), "w") as f:
+                f.write(f"# {name}\n\nSome **bold** text\n\n- a list\n- of items")
+        self.profiler = BuildProfiler(top=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.content, self.template, os.path.join(self.tmp.name, "docs"), "/", jobs=4, profiler=self.profiler)
+        self.profiler.stop()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_report(self):
+        report = self.profiler.report()
+        self.assertEqual(report["pages"], 3)
+        self.assertEqual(set(report["totals"]), set(STAGES))
+        self.assertGreater(report["totals"]["inline"], 0)
+        self.assertGreater(report["peak_bytes"], 0)
+        self.assertEqual(len(report["slowest"]), 2)
+        self.assertGreaterEqual(report["slowest"][0]["seconds"], report["slowest"][1]["seconds"])
+
+    def test_chrome_trace(self):
+        path = os.path.join(self.tmp.name, "build.trace.json")
+        self.profiler.write(path)
+        with open(path) as f:
+            trace = json.load(f)
+        names = {event["name"] for event in trace["traceEvents"]}
+        self.assertTrue(set(STAGES) <= names)
+        self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import os
+import unittest
+
+from blocknodes import parse_document
+from search import SearchIndex, page_url, shard_key
+from test_support import SiteTestCase
+
+class TestTerms(unittest.TestCase):
+    def test_terms_with_counts_and_positions(self):
+        document = parse_document("# Tom Bombadil\n\nTom **sings**, tom [dances](/x)", collect_terms=True)
+        self.assertEqual(document.terms["tom"], [3, [0, 2, 4]])
+        self.assertEqual(document.terms["dances"], [1, [5]])
+
+    def test_terms_off_by_default(self):
+        self.assertIsNone(parse_document("# Tom").terms)
+
+
+class TestSearchIndex(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state = os.path.join(self.cache_dir, "search")
+        self.write("content/index.md", "# Home\n\nWelcome to the shire")
+        self.write("content/blog/tom/index.md", "# Tom\n\nTom sings in the shire")
+
+    def build(self):
+        search = SearchIndex(self.dest, "/blog/", self.state)
+        manifest = super().build("/blog/", search=search)
+        search.prune(manifest.seen)
+        return self.rebuilt, search.write()
+
+    def shard(self, key):
+        with open(os.path.join(self.dest, "search", f"{key}.json")) as f:
+            return json.load(f)
+
+    def pages(self):
+        with open(os.path.join(self.dest, "search", "pages.json")) as f:
+            return json.load(f)
+
+    def test_index_written(self):
+        self.build()
+        pages = self.pages()
+        self.assertEqual(sorted(url for url, title in pages.values()), ["/blog/", "/blog/blog/tom/"])
+        shire = self.shard("sh")["shire"]
+        self.assertEqual(sorted(pages[str(page_id)][0] for page_id, count, positions in shire), ["/blog/", "/blog/blog/tom/"])
+
+    def test_only_touched_shards_rewritten(self):
+        self.build()
+        self.assertEqual(self.build(), (0, 0))
+        self.write("content/blog/tom/index.md", "# Tom\n\nTom dances in the shire")
+        rebuilt, written = self.build()
+        self.assertEqual(rebuilt, 1)
+        # "sings" leaves si.json and "dances" joins da.json; the other terms
+        # are unchanged but their shards are rewritten with the page's postings
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "search", "si.json")))
+        self.assertIn("dances", self.shard("da"))
+        self.assertEqual(written, 5)
+
+    def test_removed_page_dropped(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "tom", "index.md"))
+        self.build()
+        self.assertEqual([url for url, title in self.pages().values()], ["/blog/"])
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "search", "si.json")))
+        self.assertNotIn("tom", self.shard("to"))
+
+    def test_fresh_pages_indexed_when_state_missing(self):
+        self.build()
+        os.remove(self.state)
+        rebuilt, _ = self.build()
+        self.assertEqual(rebuilt, 2)
+        self.assertEqual(len(self.pages()), 2)
+
+    def test_pages_rebuilt_without_index_reindexed(self):
+        self.build()
+        self.write("content/blog/tom/index.md", "# Tom\n\nTom dances in the shire")
+        super().build("/blog/")
+        rebuilt, _ = self.build()
+        self.assertEqual(rebuilt, 1)
+        self.assertIn("dances", self.shard("da"))
+
+    def test_page_url_and_shard_key(self):
+        self.assertEqual(page_url(os.path.join("docs", "blog", "tom", "index.html"), "docs", "/blog/"), "/blog/blog/tom/")
+        self.assertEqual(page_url(os.path.join("docs", "about.html"), "docs", "/"), "/about.html")
+        self.assertEqual(shard_key("élan"), "_e9l")
+        self.assertEqual(shard_key("a"), "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from serve import StaticServer, choose_encoding
+from test_support import write_file
+
+PAGE = b"<p>" + b"hello " * 100 + b"</p>"
+
+class TestStaticServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        os.makedirs(os.path.join(self.root, "blog"))
+        self.write("index.html", PAGE)
+        self.write("blog/index.html", b"<p>blog</p>")
+        self.write("index.3f9a1c2e.css", b"body {}")
+        self.write("big.bin", os.urandom(100_000))
+        self.static = StaticServer(self.root, small_limit=1024)
+        self.server = await self.static.start("127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.tmp.cleanup()
+
+    def write(self, rel_path, data):
+        write_file(os.path.join(self.root, rel_path), data)
+
+    async def request(self, path, headers=None, method="GET", connection=None):
+        reader, writer = connection or await asyncio.open_connection("127.0.0.1", self.port)
+        lines = [f"{method} {path} HTTP/1.1", "Host: localhost"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        status = int(head.split(" ")[1])
+        response_headers = {}
+        for line in head.split("\r\n")[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                response_headers[name.lower()] = value.strip()
+        body = b""
+        if method != "HEAD" and status != 304:
+            body = await reader.readexactly(int(response_headers["content-length"]))
+        if connection is None:
+            writer.close()
+        return status, response_headers, body
+
+    async def test_serves_index_and_file(self):
+        status, headers, body = await self.request("/")
+        self.assertEqual(status, 200)
+        self.assertEqual(body, PAGE)
+        self.assertEqual(headers["content-type"], "text/html; charset=utf-8")
+        self.assertEqual(headers["cache-control"], "no-cache")
+        status, headers, body = await self.request("/index.3f9a1c2e.css")
+        self.assertEqual(headers["cache-control"], "public, max-age=31536000, immutable")
+
+    async def test_large_file_is_sent_whole(self):
+        status, headers, body = await self.request("/big.bin")
+        with open(os.path.join(self.root, "big.bin"), "rb") as f:
+            self.assertEqual(body, f.read())
+
+    async def test_directory_redirect_and_missing(self):
+        status, headers, _ = await self.request("/blog")
+        self.assertEqual((status, headers["location"]), (301, "/blog/"))
+        status, _, _ = await self.request("/nope.html")
+        self.assertEqual(status, 404)
+        status, _, _ = await self.request("/../../etc/passwd")
+        self.assertEqual(status, 404)
+
+    async def test_conditional_requests(self):
+        _, headers, _ = await self.request("/index.html")
+        status, _, body = await self.request("/index.html", {"If-None-Match": headers["etag"]})
+        self.assertEqual((status, body), (304, b""))
+        status, _, _ = await self.request("/index.html", {"If-Modified-Since": headers["last-modified"]})
+        self.assertEqual(status, 304)
+        status, _, _ = await self.request("/index.html", {"If-None-Match": '"other"'})
+        self.assertEqual(status, 200)
+
+    async def test_precompressed_variant(self):
+        self.write("index.html.gz", gzip.compress(PAGE))
+        status, headers, body = await self.request("/index.html", {"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(headers["content-encoding"], "gzip")
+        self.assertEqual(headers["vary"], "Accept-Encoding")
+        self.assertEqual(gzip.decompress(body), PAGE)
+        status, headers, body = await self.request("/index.html")
+        self.assertNotIn("content-encoding", headers)
+        self.assertEqual(body, PAGE)
+
+    async def test_stale_variant_is_ignored(self):
+        self.write("index.html.gz", gzip.compress(b"old"))
+        path = os.path.join(self.root, "index.html")
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        _, headers, body = await self.request("/index.html", {"Accept-Encoding": "gzip"})
+        self.assertNotIn("content-encoding", headers)
+        self.assertEqual(body, PAGE)
+
+    async def test_keep_alive_and_head(self):
+        connection = await asyncio.open_connection("127.0.0.1", self.port)
+        status, headers, body = await self.request("/index.html", method="HEAD", connection=connection)
+        self.assertEqual((status, body, headers["content-length"]), (200, b"", str(len(PAGE))))
+        self.write("index.html", b"<p>rebuilt</p>")
+        status, _, body = await self.request("/index.html", connection=connection)
+        self.assertEqual(body, b"<p>rebuilt</p>")
+        connection[1].close()
+
+    async def test_method_not_allowed(self):
+        status, headers, _ = await self.request("/", method="POST")
+        self.assertEqual((status, headers["allow"]), (405, "GET, HEAD"))
+
+    async def test_file_removed_while_serving(self):
+        lookup = self.static.index.lookup
+
+        def lookup_then_remove(path):
+            entry = lookup(path)
+            os.remove(path)
+            return entry
+
+        with mock.patch.object(self.static.index, "lookup", lookup_then_remove):
+            status, _, _ = await self.request("/big.bin")
+        self.assertEqual(status, 404)
+
+    async def test_unreadable_file(self):
+        with mock.patch.object(self.static.index, "lookup", side_effect=PermissionError(13, "Permission denied")):
+            status, _, _ = await self.request("/index.html")
+        self.assertEqual(status, 500)
+
+
+class TestChooseEncoding(unittest.TestCase):
+    def test_preference_and_q_values(self):
+        variants = {"gzip": None, "br": None}
+        self.assertEqual(choose_encoding("gzip, br", variants), "br")
+        self.assertEqual(choose_encoding("gzip, br;q=0", variants), "gzip")
+        self.assertIsNone(choose_encoding("identity", variants))
+        self.assertIsNone(choose_encoding("gzip", {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import unittest
+import xml.etree.ElementTree as ET
+
+from sitemap import SiteMap
+from test_support import SiteTestCase
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+SITEMAP = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+class TestSiteMap(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state = os.path.join(self.cache_dir, "sitemap")
+        self.write("content/index.md", "# Home & Away", 1000 * 10**9)
+        self.write("content/blog/tom/index.md", "# Tom\n\nBombadil", 2000 * 10**9)
+        self.write("content/blog/glorfindel/index.md", "# Glorfindel\n\nBalrog", 3000 * 10**9)
+
+    def build(self):
+        sitemap = SiteMap(self.dest, "https://example.com/", "/blog/", self.state)
+        manifest = super().build("/blog/", sitemap=sitemap)
+        sitemap.prune(manifest.seen)
+        return self.rebuilt, sitemap.write()
+
+    def parse(self, name):
+        return ET.parse(os.path.join(self.dest, name)).getroot()
+
+    def test_sitemap_lists_every_page(self):
+        self.build()
+        urls = self.parse("sitemap.xml").findall(f"{SITEMAP}url")
+        self.assertEqual(
+            [(url.find(f"{SITEMAP}loc").text, url.find(f"{SITEMAP}lastmod").text) for url in urls],
+            [
+                ("https://example.com/blog/", "1970-01-01T00:16:40Z"),
+                ("https://example.com/blog/blog/glorfindel/", "1970-01-01T00:50:00Z"),
+                ("https://example.com/blog/blog/tom/", "1970-01-01T00:33:20Z"),
+            ],
+        )
+
+    def test_feed_has_blog_posts_newest_first(self):
+        self.build()
+        feed = self.parse("feed.xml")
+        self.assertEqual(feed.find(f"{ATOM}title").text, "Home & Away")
+        self.assertEqual(feed.find(f"{ATOM}updated").text, "1970-01-01T00:50:00Z")
+        self.assertEqual([entry.find(f"{ATOM}title").text for entry in feed.findall(f"{ATOM}entry")], ["Glorfindel", "Tom"])
+
+    def test_written_only_when_an_entry_changed(self):
+        self.build()
+        self.assertEqual(self.build(), (0, 0))
+        self.write("content/blog/tom/index.md", "# Tom Bombadil\n\nBombadil", 4000 * 10**9)
+        self.assertEqual(self.build(), (1, 2))
+        titles = [entry.find(f"{ATOM}title").text for entry in self.parse("feed.xml").findall(f"{ATOM}entry")]
+        self.assertEqual(titles, ["Tom Bombadil", "Glorfindel"])
+
+    def test_pages_rebuilt_without_sitemap_updated(self):
+        self.build()
+        self.write("content/blog/tom/index.md", "# Tom Bombadil\n\nBombadil", 4000 * 10**9)
+        super().build("/blog/")
+        self.assertEqual(self.build(), (1, 2))
+        titles = [entry.find(f"{ATOM}title").text for entry in self.parse("feed.xml").findall(f"{ATOM}entry")]
+        self.assertEqual(titles, ["Tom Bombadil", "Glorfindel"])
+
+    def test_removed_page_dropped(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "tom", "index.md"))
+        self.assertEqual(self.build(), (0, 2))
+        self.assertEqual(len(self.parse("sitemap.xml")), 2)
+
+    def test_fresh_pages_added_when_state_missing(self):
+        self.build()
+        os.remove(self.state)
+        self.assertEqual(self.build(), (3, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from copy_contents import generate_pages_recursive
+from manifest import BuildManifest
+
+TEMPLATE = "<title>{{ Title }}</title>{{ Content }}"
+
+
+def write_file(path, data, mtime_ns=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+class SiteTestCase(unittest.TestCase):
+    # a site in a temporary directory laid out like the real one: content/,
+    # static/, docs/, template.html and .build-cache/. write() takes paths
+    # relative to that root and build() runs the page build quietly.
+    template_text = TEMPLATE
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.dest = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        self.cache_dir = os.path.join(self.root, ".build-cache")
+        self.manifest_path = os.path.join(self.cache_dir, "manifest")
+        self.write("template.html", self.template_text)
+
+    def write(self, rel_path, data, mtime_ns=None):
+        return write_file(os.path.join(self.root, rel_path), data, mtime_ns)
+
+    def build(self, basepath="/", **options):
+        # the manifest of the build; the page count lands in self.rebuilt and
+        # the outputs of dropped pages in self.orphans
+        manifest = BuildManifest.load(self.manifest_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.rebuilt = generate_pages_recursive(self.content, self.template, self.dest, basepath, manifest, **options)
+        self.orphans = manifest.save()
+        return manifest
@@ -0,0 +1,68 @@
+import unittest
+
+from template import Template
+
+TEMPLATE = '<title>{{ Title }}</title><link href="/index.css"><article>{{ Content }}</article>'
+
+def render_with_replace(text, title, content, basepath):
+    text = text.replace("{{ Title }}", title)
+    text = text.replace("{{ Content }}", content)
+    text = text.replace('href="/', f'href="{basepath}')
+    return text.replace('src="/', f'src="{basepath}')
+
+class TestTemplate(unittest.TestCase):
+    def test_compiled_parts(self):
+        template = Template(TEMPLATE, "/blog/")
+        self.assertEqual(
+            template.parts,
+            [
+                (False, "<title>"),
+                (True, "{{ Title }}"),
+                (False, '</title><link href="/blog/index.css"><article>'),
+                (True, "{{ Content }}"),
+                (False, "</article>"),
+            ],
+        )
+
+    def test_render_matches_replace(self):
+        content = '<p><a href="/blog/tom">Tom</a><img src="/images/tom.png" alt="Tom"></p>'
+        for basepath in ("/", "/blog/"):
+            template = Template(TEMPLATE, basepath)
+            self.assertEqual(
+                template.render("Tom", content),
+                render_with_replace(TEMPLATE, "Tom", content, basepath),
+            )
+
+    def test_repeated_and_missing_slots(self):
+        template = Template("{{ Title }}|{{ Title }}", "/")
+        self.assertEqual(template.render("a", "ignored"), "a|a")
+
+    def test_iter_render_streams_content(self):
+        template = Template(TEMPLATE, "/blog/")
+        chunks = ["<p>", '<a href="/tom">', "Tom", "</a>", "</p>"]
+        self.assertEqual(
+            "".join(template.iter_render("Tom", iter(chunks))),
+            template.render("Tom", "".join(chunks)),
+        )
+
+    def test_repeated_content_slot(self):
+        template = Template("{{ Content }}|{{ Content }}", "/")
+        self.assertEqual("".join(template.iter_render("t", iter(["a", "b"]))), "ab|ab")
+
+    def test_fingerprinted_assets(self):
+        assets = {"/index.css": "/index.3f9a1c2e.css", "/images/tom.png": "/images/tom.0b1d2f3a.png"}
+        template = Template(TEMPLATE, "/blog/", assets)
+        content = '<p><a href="/tom">Tom</a><img src="/images/tom.png" alt="Tom"></p>'
+        self.assertEqual(
+            template.render("Tom", content),
+            '<title>Tom</title><link href="/blog/index.3f9a1c2e.css"><article>'
+            '<p><a href="/blog/tom">Tom</a><img src="/blog/images/tom.0b1d2f3a.png" alt="Tom"></p></article>',
+        )
+
+    def test_no_slots(self):
+        template = Template('<a href="/x">', "/base/")
+        self.assertEqual(template.render("t", "c"), '<a href="/base/x">')
+
+
+if __name__ == "__main__":
+    unittest.main()
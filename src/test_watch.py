@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import unittest
+
+from copy_contents import copy_files
+from manifest import BuildManifest
+from test_support import SiteTestCase
+from watch import Watcher
+
+class TestWatcher(SiteTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("content/index.md", "# Home\n\nWelcome")
+        self.write("content/blog/tom/index.md", "# Tom\n\nBombadil")
+        self.write("static/index.css", "body {}")
+        self.start(static_state_path=os.path.join(self.cache_dir, "static"))
+
+    def start(self, manifest=None, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.watcher = Watcher(self.content, self.static, self.template, self.dest, "/", manifest, **options)
+            for source in (os.path.join(self.content, "index.md"), os.path.join(self.content, "blog", "tom", "index.md")):
+                self.watcher.render(source)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.dest, rel_path)) as f:
+            return f.read()
+
+    def poll(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.watcher.poll()
+        return out.getvalue()
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.poll(), "")
+
+    def test_only_changed_page_rebuilt(self):
+        self.write("content/blog/tom/index.md", "# Tom\n\nGoldberry", 10**9)
+        log = self.poll()
+        self.assertIn("Rebuilt 1 page(s)", log)
+        self.assertIn("Goldberry", self.read("blog/tom/index.html"))
+
+    def test_template_change_reuses_parsed_documents(self):
+        cached = self.watcher.documents[os.path.join(self.content, "index.md")]
+        self.write("template.html", "<h1>{{ Title }}</h1>{{ Content }}", 10**9)
+        self.assertIn("Rebuilt 2 page(s)", self.poll())
+        self.assertTrue(self.read("index.html").startswith("<h1>Home</h1>"))
+        self.assertIs(self.watcher.documents[os.path.join(self.content, "index.md")], cached)
+
+    def test_new_and_removed_pages(self):
+        self.write("content/contact/index.md", "# Contact\n\nMail")
+        os.remove(os.path.join(self.content, "blog", "tom", "index.md"))
+        self.poll()
+        self.assertIn("Mail", self.read("contact/index.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "tom", "index.html")))
+
+    def test_static_change_synced(self):
+        self.write("static/index.css", "body { margin: 0 }", 10**9)
+        self.assertIn("Rebuilt 0 page(s)", self.poll())
+        self.assertEqual(self.read("index.css"), "body { margin: 0 }")
+
+    def test_static_change_rebuilds_referencing_pages(self):
+        self.write("content/blog/tom/index.md", "# Tom\n\n![Tom](/images/tom.png)")
+        self.write("static/images/tom.png", "png")
+        state = os.path.join(self.cache_dir, "static")
+        assets = {}
+        copy_files(self.static, self.dest, "copy", state, assets)
+        self.start(BuildManifest(self.manifest_path), static_state_path=state, assets=assets)
+        self.write("static/images/tom.png", "new png", 10**9)
+        self.assertIn("Rebuilt 1 page(s)", self.poll())
+        self.assertIn(self.watcher.assets["/images/tom.png"], self.read("blog/tom/index.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,12 +9,19 @@ class TextType(Enum):
     IMAGE = "image"
 
 class TextNode:
-    def __init__(self, text, text_type: TextType, url=None):
+    __slots__ = ("text", "text_type", "url", "children")
+
+    def __init__(self, text, text_type: TextType, url=None, children=None):
         self.text = text
         self.text_type = text_type
         self.url = url
+        # nested nodes for emphasis that contains other markup; text then
+        # holds the plain text of the children
+        self.children = children
     def __eq__(self, other):
-        return self.text == other.text and self.text_type == other.text_type and self.url == other.url
+        return self.text == other.text and self.text_type == other.text_type and self.url == other.url and self.children == other.children
     def __repr__(self):
+        if self.children:
+            return f"TextNode({self.text}, {self.text_type.value}, {self.url}, {self.children})"
         return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
     
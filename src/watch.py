@@ -0,0 +1,191 @@
+import os
+import time
+from copy_contents import STATIC_STATE_PATH, copy_files, remove_outputs, write_page
+from blocknodes import parse_document
+from manifest import build_inputs, reference_inputs
+from template import Template, template_references
+
+class Watcher:
+    # polls content/, static/ and the template and rebuilds only what changed.
+    # The compiled template and every parsed Document stay in memory, so a
+    # template edit re-renders pages without parsing any markdown again.
+    # assets is the fingerprint map from copy_files, or None when static files
+    # keep their names. image_index, when given, is rescanned on static changes
+    # so pages pick up new image dimensions, and inlined styles are reread.
+    # search, a SearchIndex, sitemap, a SiteMap, and links, a LinkChecker, are
+    # updated with every page rendered or removed; broken links are reported
+    # after each rebuild.
+    def __init__(self, content_path, static_path, template_path, dest_path, basepath, manifest=None, link="copy", static_state_path=STATIC_STATE_PATH, assets=None, compressor=None, image_index=None, minify=False, styles=None, search=None, sitemap=None, links=None):
+        self.content_path = content_path
+        self.static_path = static_path
+        self.template_path = template_path
+        self.dest_path = dest_path
+        self.basepath = basepath
+        self.manifest = manifest
+        self.link = link
+        self.static_state_path = static_state_path
+        self.assets = assets
+        self.compressor = compressor
+        self.image_index = image_index
+        self.minify = minify
+        self.styles = styles
+        self.search = search
+        self.sitemap = sitemap
+        self.links = links
+        # pages record the static files they reference, which needs their links
+        self.collect_links = links is not None or (manifest is not None and (assets is not None or image_index is not None))
+        self.images = None if image_index is None else image_index.scan()
+        self.template = Template.load(template_path, basepath, assets, self.images, minify, styles)
+        self.inputs = build_inputs(template_path, basepath, assets, self.images, minify, styles, template_references(template_path))
+        self.documents = {}
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for root_path in (self.content_path, self.static_path):
+            for root, dirs, files in os.walk(root_path):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+        try:
+            st = os.stat(self.template_path)
+            snapshot[self.template_path] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return snapshot
+
+    def dest_for(self, source):
+        rel_path = os.path.relpath(source, self.content_path)
+        return os.path.join(self.dest_path, os.path.splitext(rel_path)[0] + ".html")
+
+    def is_page(self, path):
+        return path.endswith(".md") and is_inside(path, self.content_path)
+
+    def poll(self):
+        current = self.scan()
+        changed = [path for path, stamp in current.items() if self.snapshot.get(path) != stamp]
+        removed = [path for path in self.snapshot if path not in current]
+        self.snapshot = current
+        if changed or removed:
+            self.rebuild(changed, removed)
+        return changed, removed
+
+    def rebuild(self, changed, removed):
+        started = time.perf_counter()
+        pages = set()
+        reload_template = self.template_path in changed
+        # reference inputs (asset:<url>, image:<url>) whose value changed
+        changed_references = []
+        if any(is_inside(path, self.static_path) for path in changed + removed):
+            assets = None if self.assets is None else {}
+            copy_files(self.static_path, self.dest_path, self.link, self.static_state_path, assets)
+            if assets != self.assets:
+                changed_references.extend(f"asset:{url}" for url in changed_keys(self.assets, assets))
+                self.assets = assets
+            if self.image_index is not None:
+                images = self.image_index.scan()
+                self.image_index.save()
+                if images != self.images:
+                    changed_references.extend(f"image:{url}" for url in changed_keys(self.images, images))
+                    self.images = images
+            if self.styles is not None and any(path.endswith(".css") for path in changed + removed):
+                self.styles.reset()
+                reload_template = True
+        if reload_template or changed_references:
+            inputs = self.inputs
+            self.template = Template.load(self.template_path, self.basepath, self.assets, self.images, self.minify, self.styles)
+            self.inputs = build_inputs(self.template_path, self.basepath, self.assets, self.images, self.minify, self.styles, template_references(self.template_path))
+            if reload_template or self.inputs != inputs or self.manifest is None:
+                pages.update(path for path in self.snapshot if self.is_page(path))
+                pages.update(self.documents)
+            else:
+                # only the pages that reference a static file whose hashed
+                # name or image size changed
+                for name in changed_references:
+                    pages.update(self.manifest.dependents(name))
+        for path in changed:
+            if self.is_page(path):
+                self.documents.pop(path, None)
+                pages.add(path)
+        for path in removed:
+            if self.is_page(path):
+                self.documents.pop(path, None)
+                pages.discard(path)
+                self.remove_page(path)
+        for path in sorted(pages):
+            self.render(path)
+        if self.manifest is not None:
+            self.manifest.save()
+        if self.search is not None:
+            self.search.write()
+        if self.sitemap is not None:
+            self.sitemap.write()
+        if self.links is not None:
+            self.links.save()
+            for source, link in self.links.check(self.static_path):
+                print(f"Broken link in {source}: {link}")
+        if self.compressor is not None:
+            self.compressor.sweep(self.dest_path)
+            self.compressor.finish()
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"Rebuilt {len(pages)} page(s) in {elapsed:.1f} ms")
+
+    def render(self, source):
+        dest = self.dest_for(source)
+        try:
+            document = self.documents.get(source)
+            if document is None:
+                with open(source, "r") as f:
+                    document = parse_document(f.read(), self.search is not None, self.collect_links)
+                self.documents[source] = document
+            write_page(document, self.template, dest)
+            print(f"Generated: {dest}")
+            if self.manifest is not None:
+                references = None if document.links is None else reference_inputs(document.links, self.assets, self.images)
+                self.manifest.record(source, dest, self.inputs, references)
+            if self.compressor is not None:
+                self.compressor.submit(dest)
+            source_hash = None if self.manifest is None else self.manifest.built_from(source)
+            if self.search is not None:
+                self.search.update(source, dest, document, source_hash)
+            if self.sitemap is not None:
+                self.sitemap.update(source, dest, document, source_hash)
+            if self.links is not None:
+                self.links.update(source, dest, document, source_hash)
+        except Exception as e:
+            if self.manifest is not None:
+                self.manifest.forget(source)
+            print(f"Error processing {source}: {str(e)}")
+
+    def remove_page(self, source):
+        dest = self.dest_for(source)
+        if os.path.exists(dest):
+            remove_outputs(self.dest_path, [dest])
+            print(f"Removed: {dest}")
+        if self.manifest is not None:
+            self.manifest.forget(source)
+        if self.search is not None:
+            self.search.remove(source)
+        if self.sitemap is not None:
+            self.sitemap.remove(source)
+        if self.links is not None:
+            self.links.remove(source)
+
+    def run(self, interval=0.1):
+        print(f"Watching {self.content_path}, {self.static_path} and {self.template_path} (Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+
+def is_inside(path, directory):
+    return os.path.commonpath([os.path.abspath(path), os.path.abspath(directory)]) == os.path.abspath(directory)
+
+def changed_keys(old, new):
+    return [key for key in set(old) | set(new) if old.get(key) != new.get(key)]